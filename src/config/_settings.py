@@ -60,6 +60,17 @@ class Config:
     EMBEDDINGS_MODEL = "all-MiniLM-L6-v2"
     CHUNK_SIZE = 1000
     CHUNK_OVERLAP = 200
+    # Shortened OpenAI embedding size for ChromaDB (None = model default, e.g. 1536).
+    # Changing it requires re-indexing existing collections.
+    EMBEDDING_DIMENSIONS = None
+    # Memory cap for loaded ChromaDB collection indexes (None = keep every collection resident)
+    CHROMA_MEMORY_LIMIT_BYTES = None
+    # HNSW tuning for new ChromaDB collections,
+    # e.g. {"M": 32, "construction_ef": 200, "search_ef": 64}.
+    # New vectors first land in a flat brute-force buffer that is merged into the graph every
+    # "batch_size" adds (Chroma default 100); raise it for bulk ingests, with "sync_threshold"
+    # (default 1000) >= batch_size, to merge in fewer, larger steps.
+    CHROMA_HNSW_CONFIG = {}
 
     # Backend
     BACKEND_PORT = 8000
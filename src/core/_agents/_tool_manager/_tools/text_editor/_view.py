@@ -11,7 +11,8 @@
 # in the root directory of this source tree.
 # -----------------------------------------------------------------------------
 
-from typing import Any, List, Dict, Optional
+import os
+from typing import Any, List, Dict, Optional, Union
 from pathlib import Path
 
 # import json
@@ -348,6 +349,12 @@ class ViewTool(BaseTool):
             size_float /= 1024
         return f"{size_float:.1f}TB"
 
+    @staticmethod
+    def _scan_dir(dir_path: Union[str, Path]) -> List[os.DirEntry[str]]:
+        """List directory entries with a single scandir call."""
+        with os.scandir(dir_path) as entries:
+            return list(entries)
+
     def _list_directory(
         self, dir_path: Path, display_path: str, level: int = 0, max_level: int = 2
     ) -> str:
@@ -365,7 +372,9 @@ class ViewTool(BaseTool):
             return output
 
         try:
-            items = sorted(dir_path.iterdir(), key=lambda x: (not x.is_dir(), x.name))
+            # DirEntry.is_dir() answers from the directory listing itself, so sorting and
+            # rendering entries does not stat every file the way Path.is_dir() does
+            items = sorted(self._scan_dir(dir_path), key=lambda x: (not x.is_dir(), x.name))
 
             for item in items:
                 indent = "  " * level
@@ -379,7 +388,7 @@ class ViewTool(BaseTool):
                             if level == 1:
                                 # Get child items count to decide if we should truncate
                                 try:
-                                    child_items = list(item.iterdir())
+                                    child_items = self._scan_dir(item.path)
                                     child_count = len(child_items)
 
                                     # If current output is getting large, skip level 2 details
@@ -410,7 +419,9 @@ class ViewTool(BaseTool):
                                 except (PermissionError, OSError):
                                     output += f"{indent}  ⊢ (Permission denied)\n"
                             else:
-                                output += self._list_directory(item, "", level + 1, max_level)
+                                output += self._list_directory(
+                                    Path(item.path), "", level + 1, max_level
+                                )
                     else:
                         size = item.stat().st_size
                         size_str = self._format_size(size)
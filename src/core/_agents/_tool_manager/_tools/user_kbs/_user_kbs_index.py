@@ -9,7 +9,9 @@ Includes tools for:
 - Managing context and chunk relationships
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, FrozenSet, Tuple
+from operator import itemgetter
+import heapq
 import json
 
 from ......infrastructure.storage import get_chromadb_store
@@ -44,6 +46,8 @@ class UserKBsIndex:
             user_id: User ID for scoped access (default: current operation user)
         """
         self.kb_ids = kb_ids or []
+        # Set view of kb_ids for O(1) scope checks on retrieved chunks
+        self._kb_id_set: FrozenSet[str] = frozenset(self.kb_ids)
         self.user_id = user_id or get_operation_user_id()
         self.collection_name = f"chunks_{self.user_id}"
         self.chroma_store = get_chromadb_store()
@@ -110,31 +114,34 @@ class UserKBsIndex:
             Formatted string with doc_ids and doc_names
         """
         try:
-            # Get KB to access doc_ids
+            # Get KB to access doc_ids; only the fields listed here are fetched
             with get_db_session() as db:
                 kb_entry = db[Config.KNOWLEDGE_BASES_COLLECTION].find_one(
-                    {"_id": kb_id, "user_id": self.user_id}
+                    {"_id": kb_id, "user_id": self.user_id}, {"doc_ids": 1}
                 )
 
-            if not kb_entry:
-                logger.warning(f"KB {kb_id} not found")
-                return f"Knowledge base '{kb_id}' not found."
-
-            kb = KnowledgeBase(**kb_entry)
-
-            # Get document details
-            with get_db_session() as db:
-                docs = db[Config.DOCUMENTS_COLLECTION].find({"_id": {"$in": kb.doc_ids}}).to_list()
+                if not kb_entry:
+                    logger.warning(f"KB {kb_id} not found")
+                    return f"Knowledge base '{kb_id}' not found."
+
+                # Get document details
+                docs = (
+                    db[Config.DOCUMENTS_COLLECTION]
+                    .find(
+                        {"_id": {"$in": kb_entry.get("doc_ids", [])}},
+                        {"_id": 1, "doc_name": 1, "source": 1},
+                    )
+                    .to_list()
+                )
 
             if not docs:
                 return f"No documents found in KB '{kb_id}'."
 
             lines = [f"Documents in KB '{kb_id}':"]
             for doc_entry in docs:
-                doc = Document(**doc_entry)
-                source = doc.source or "upload"
-                lines.append(f"- Doc ID: {doc.doc_id}")
-                lines.append(f"  File Name: {doc.doc_name}")
+                source = doc_entry.get("source") or "upload"
+                lines.append(f"- Doc ID: {doc_entry['_id']}")
+                lines.append(f"  File Name: {doc_entry.get('doc_name')}")
                 lines.append(f"  Source: {source}")
 
             result = "\n".join(lines)
@@ -157,13 +164,17 @@ class UserKBsIndex:
         """
         try:
             with get_db_session() as db:
-                doc_entry = db[Config.DOCUMENTS_COLLECTION].find_one({"_id": doc_id})
+                doc_entry = db[Config.DOCUMENTS_COLLECTION].find_one(
+                    {"_id": doc_id}, {"doc_name": 1, "source": 1}
+                )
 
             if not doc_entry:
                 return None
 
-            doc = Document(**doc_entry)
-            return {"doc_name": doc.doc_name, "source": doc.source or "upload"}
+            return {
+                "doc_name": doc_entry.get("doc_name"),
+                "source": doc_entry.get("source") or "upload",
+            }
         except Exception as e:
             logger.debug(f"Failed to get document info for {doc_id}: {e}")
             return None
@@ -171,8 +182,7 @@ class UserKBsIndex:
     def _count_chunks_for_doc(self, doc_id: str) -> int:
         """Get chunk count for a document."""
         try:
-            chunks = self.chroma_store.get_document_chunks_in_order(self.collection_name, doc_id)
-            return len(chunks)
+            return self.chroma_store.count_document_chunks(self.collection_name, doc_id)
         except Exception:
             return 0
 
@@ -199,43 +209,82 @@ class UserKBsIndex:
         Returns:
             Formatted string with matching chunks and full content
         """
+        return self.query_chunks_batch([query_text], kb_ids, doc_ids, n_results)
+
+    def query_chunks_batch(
+        self,
+        query_texts: List[str],
+        kb_ids: Optional[List[str]] = None,
+        doc_ids: Optional[List[str]] = None,
+        n_results: int = 10,
+    ) -> str:
+        """
+        Search chunks for several query variants at once as LLM-passable string.
+
+        All queries are embedded and searched in a single ChromaDB call, which is
+        much cheaper than one search per query when expanding a query into variants.
+        Results of all variants are merged into one ranking by distance, keeping each
+        chunk once at its best distance.
+
+        Args:
+            query_texts: Search queries
+            kb_ids: KB IDs to search in (defaults to client's kb_ids)
+            doc_ids: Optional document IDs to limit search
+            n_results: Number of results to return
+
+        Returns:
+            Formatted string with the best matching chunks across all queries
+        """
         try:
             # Use client's kb_ids if not specified
             search_kb_ids = kb_ids or self.kb_ids or []
 
-            results = self.chroma_store.query(
+            batched_results = self.chroma_store.query_batch(
                 self.collection_name,
-                [query_text],
+                query_texts,
                 n_results=n_results,
                 kb_ids=search_kb_ids if search_kb_ids else None,
                 doc_ids=doc_ids,
             )
-            chunks = [c for c, _ in results]
 
-            if not chunks:
-                return f"No chunks found matching query: '{query_text}'"
-
-            lines = [f"Search Results for: '{query_text}'", f"Found {len(chunks)} chunks\n"]
-            for idx, chunk in enumerate(chunks, 1):
-                chunk_dict = self._chunk_to_dict(chunk)
-                lines.append(f"--- Result {idx} ---")
-                lines.append(f"Chunk ID: {chunk_dict['chunk_id']}")
-                lines.append(f"Document ID: {chunk_dict['doc_id']}")
-                lines.append("")
-                lines.append(json.dumps(chunk_dict["content"], indent=1))
-                lines.append("")
+            # Best (smallest) distance per chunk across all query variants
+            best_matches: Dict[str, Tuple[Chunk, float]] = {}
+            for results in batched_results:
+                for chunk, distance in results:
+                    best = best_matches.get(chunk.chunk_id)
+                    if best is None or distance < best[1]:
+                        best_matches[chunk.chunk_id] = (chunk, distance)
+            top_matches = heapq.nsmallest(n_results, best_matches.values(), key=itemgetter(1))
 
-            result = "\n".join(lines)
             logger.info(
-                f"Found {len(chunks)} chunks matching query "
+                f"Searched {len(query_texts)} queries "
                 f"(kb_ids={search_kb_ids}, doc_ids={doc_ids})"
             )
-            return result
+            return self._format_query_results(
+                " | ".join(query_texts), [chunk for chunk, _ in top_matches]
+            )
 
         except Exception as e:
             logger.error(f"Failed to query chunks: {e}")
             return f"Error during search: {str(e)}"
 
+    def _format_query_results(self, query_text: str, chunks: List[Chunk]) -> str:
+        """Format the chunks matching one query as LLM-passable string."""
+        if not chunks:
+            return f"No chunks found matching query: '{query_text}'"
+
+        lines = [f"Search Results for: '{query_text}'", f"Found {len(chunks)} chunks\n"]
+        for idx, chunk in enumerate(chunks, 1):
+            chunk_dict = self._chunk_to_dict(chunk)
+            lines.append(f"--- Result {idx} ---")
+            lines.append(f"Chunk ID: {chunk_dict['chunk_id']}")
+            lines.append(f"Document ID: {chunk_dict['doc_id']}")
+            lines.append("")
+            lines.append(json.dumps(chunk_dict["content"], indent=1))
+            lines.append("")
+
+        return "\n".join(lines)
+
     def get_chunk_by_id(self, chunk_id: str) -> str:
         """
         Get a specific chunk by ID as LLM-passable string.
@@ -254,7 +303,7 @@ class UserKBsIndex:
                 return f"Chunk '{chunk_id}' not found."
 
             # Verify chunk is in scope
-            if self.kb_ids and chunk.metadata.get("kb_id") not in self.kb_ids:
+            if self._kb_id_set and chunk.metadata.get("kb_id") not in self._kb_id_set:
                 logger.warning(f"Chunk {chunk_id} not in scope for KBs {self.kb_ids}")
                 return f"Chunk '{chunk_id}' not in scope."
 
@@ -507,10 +556,14 @@ class UserKBsIndex:
             with get_db_session() as db:
                 docs = db[Config.DOCUMENTS_COLLECTION].find({"_id": {"$in": kb.doc_ids}}).to_list()
 
+            # Count chunks for all documents with a single ChromaDB read
+            chunk_counts = self.chroma_store.count_chunks_by_document(
+                self.collection_name, [doc_entry["_id"] for doc_entry in docs]
+            )
+
             for doc_entry in docs:
                 doc = Document(**doc_entry)
-                # Count chunks for this document in ChromaDB
-                chunk_count = self._count_chunks_for_doc(doc.doc_id)
+                chunk_count = chunk_counts.get(doc.doc_id, 0)
 
                 doc_list.append(
                     {
@@ -590,6 +643,6 @@ class UserKBsIndex:
         Returns:
             True if in scope (or client has no kb_ids constraint), False otherwise
         """
-        if not self.kb_ids:
+        if not self._kb_id_set:
             return True
-        return kb_id in self.kb_ids
+        return kb_id in self._kb_id_set
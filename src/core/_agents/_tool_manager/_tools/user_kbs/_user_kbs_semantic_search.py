@@ -49,13 +49,16 @@ class SemanticSearchTool(BaseTool):
             "**PARAMETERS**:\n"
             "- description: One-sentence description of the task being performed\n"
             "- query: Search query text (required)\n"
+            "- additional_queries: Optional '|'-separated query variants "
+            "searched in the same call\n"
             "- kb_ids: Optional comma-separated KB IDs to limit search (default: all KBs)\n"
             "- doc_ids: Optional comma-separated Document IDs to limit search\n"
             "- n_results: Number of results to return (default: 10, max: 50)\n\n"
             "**EXAMPLES**:\n"
             "- query='project timeline and deadlines'\n"
             "- query='budget allocation' kb_ids='kb_001,kb_002' n_results=5\n"
-            "- query='implementation details' doc_ids='doc_123,doc_456'\n\n"
+            "- query='implementation details' doc_ids='doc_123,doc_456'\n"
+            "- query='revenue growth' additional_queries='sales increase|income trend'\n\n"
             "**USE CASES**:\n"
             "- Find related content across multiple documents\n"
             "- Semantic similarity matching for research\n"
@@ -74,6 +77,10 @@ class SemanticSearchTool(BaseTool):
                 "type": "string",
                 "description": "Search query text",
             },
+            "additional_queries": {
+                "type": "string",
+                "description": "Optional '|'-separated query variants searched in the same call",
+            },
             "kb_ids": {
                 "type": "string",
                 "description": "Optional comma-separated KB IDs to limit search (default: all KBs)",
@@ -96,6 +103,7 @@ class SemanticSearchTool(BaseTool):
         """Execute semantic search"""
         _ = kwargs.get("description")
         query = kwargs.get("query")
+        additional_queries_str = kwargs.get("additional_queries")
         kb_ids_str = kwargs.get("kb_ids")
         doc_ids_str = kwargs.get("doc_ids")
         n_results = kwargs.get("n_results", 10)
@@ -111,6 +119,11 @@ class SemanticSearchTool(BaseTool):
         # Parse comma-separated IDs
         kb_ids = [k.strip() for k in kb_ids_str.split(",")] if kb_ids_str else None
         doc_ids = [d.strip() for d in doc_ids_str.split(",")] if doc_ids_str else None
+        additional_queries = (
+            [q.strip() for q in additional_queries_str.split("|") if q.strip()]
+            if additional_queries_str
+            else []
+        )
 
         # Validate n_results
         try:
@@ -123,12 +136,21 @@ class SemanticSearchTool(BaseTool):
         )
 
         try:
-            result = self.index.query_chunks(
-                query_text=query,
-                kb_ids=kb_ids,
-                doc_ids=doc_ids,
-                n_results=n_results,
-            )
+            if additional_queries:
+                # Query variants are embedded and searched together in one batch
+                result = self.index.query_chunks_batch(
+                    query_texts=[query, *additional_queries],
+                    kb_ids=kb_ids,
+                    doc_ids=doc_ids,
+                    n_results=n_results,
+                )
+            else:
+                result = self.index.query_chunks(
+                    query_text=query,
+                    kb_ids=kb_ids,
+                    doc_ids=doc_ids,
+                    n_results=n_results,
+                )
 
             return ToolResultContent(
                 tool_call_id=func_call_id,
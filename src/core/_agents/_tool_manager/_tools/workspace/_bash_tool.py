@@ -16,6 +16,7 @@ from typing import Any, List, Optional, Dict, Tuple
 import subprocess
 import shlex
 import os
+import stat
 from pathlib import Path
 from datetime import datetime, timezone
 import mimetypes
@@ -200,8 +201,8 @@ class BashTool(BaseTool):
                     logger.error(f"Error decoding base64 content for {filename}: {e}")
                     continue
 
-                # Get file size
-                file_size = file_path.stat().st_size
+                # File size is the number of bytes just written; no need to stat
+                file_size = len(file_content)
 
                 # Determine content type
                 content_type, _ = mimetypes.guess_type(str(file_path))
@@ -486,11 +487,14 @@ class BashTool(BaseTool):
 
             # Recursively iterate through all files in the directory
             for file_path in sorted(user_data_dir.rglob("*")):
-                if file_path.is_file():
+                # One stat per entry: it both filters regular files and provides the metadata
+                try:
+                    stat_info = file_path.stat()
+                except OSError as e:
+                    logger.error(f"Error processing file {file_path}: {e}")
+                    continue
+                if stat.S_ISREG(stat_info.st_mode):
                     try:
-                        # Get file stats
-                        stat_info = file_path.stat()
-
                         # Determine content type
                         content_type, _ = mimetypes.guess_type(str(file_path))
                         if not content_type:
@@ -510,10 +514,8 @@ class BashTool(BaseTool):
                             / ".edit_history"
                             / f"{file_path_rel.stem}{file_path_rel.suffix}"
                         )
-                        version = 1
-                        if history_dir.exists():
-                            history_entries = list(history_dir.glob("*.json"))
-                            version = len(history_entries) + 1
+                        # glob yields nothing for a missing directory, so no exists() check
+                        version = sum(1 for _ in history_dir.glob("*.json")) + 1
 
                         files_metadata.append(
                             ConversationFileMetadata(
@@ -7,6 +7,7 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime, timezone
 import os
 import threading
+from collections import defaultdict
 from concurrent.futures import as_completed, Future
 from contextvars import copy_context
 import tiktoken
@@ -15,7 +16,7 @@ from ..infrastructure.database import get_db_session
 from ..config import Config
 from ..infrastructure.storage import S3Service, get_chromadb_store
 from ..infrastructure.ids import generate_chunk_id
-from ..infrastructure.dynamic_thread_pool import chunk_executor
+from ..infrastructure.dynamic_thread_pool import chunk_executor, io_executor
 from ..infrastructure.clients import FileProcessorClient
 from .models.operation_audit import TaskStatus, ServiceType
 from ..infrastructure.operation_logging import (
@@ -69,11 +70,17 @@ class RAGIndexManager:
                 )
 
     def _finalize_index_build(
-        self, kb_id: str, chunks: List[Chunk], processing_completed_at: datetime
+        self, kb_id: str, indexed_doc_ids: List[str], processing_completed_at: datetime
     ) -> None:
-        """Finalize index build: update KB status and mark operation."""
-        kb_status = TaskStatus.COMPLETED if chunks else TaskStatus.FAILED
-        should_update_index_build_at = bool(chunks)
+        """Finalize index build: update KB status and mark operation.
+
+        Args:
+            kb_id: Knowledge base ID
+            indexed_doc_ids: IDs of documents that have chunks stored in ChromaDB
+            processing_completed_at: Completion timestamp
+        """
+        kb_status = TaskStatus.COMPLETED if indexed_doc_ids else TaskStatus.FAILED
+        should_update_index_build_at = bool(indexed_doc_ids)
 
         with self._db_lock:
             with get_db_session() as db:
@@ -87,8 +94,6 @@ class RAGIndexManager:
 
                 if should_update_index_build_at:
                     update_data["$set"]["index_build_at"] = processing_completed_at
-                    # Extract doc_ids from chunks that were actually indexed
-                    indexed_doc_ids = list(set(chunk.doc_id for chunk in chunks if chunk.doc_id))
                     # Add indexed docs to both doc_ids and index_build_on_doc_ids (without losing newly added ones)
                     update_data["$addToSet"] = {
                         "doc_ids": {"$each": indexed_doc_ids},
@@ -102,7 +107,7 @@ class RAGIndexManager:
                     {"_id": kb_id, "user_id": get_operation_user_id()}, update_data
                 )
 
-        if chunks:
+        if indexed_doc_ids:
             logger.info(f"KB {kb_id} index build complete")
             mark_operation_complete()
         else:
@@ -161,17 +166,14 @@ class RAGIndexManager:
 
             # Step 2: Identify documents that need chunking
             docs_to_chunk = [d for d in doc_models if not d.chunked]
-            docs_by_source: Dict[str, List[Document]] = {}
+            docs_by_source: Dict[str, List[Document]] = defaultdict(list)
 
             if docs_to_chunk:
                 logger.info(f"Found {len(docs_to_chunk)} documents that need chunking")
 
                 # Group documents by source
                 for doc in docs_to_chunk:
-                    source = doc.source or "default"
-                    if source not in docs_by_source:
-                        docs_by_source[source] = []
-                    docs_by_source[source].append(doc)
+                    docs_by_source[doc.source or "default"].append(doc)
 
                 with self._db_lock:
                     with get_db_session() as db:
@@ -223,13 +225,17 @@ class RAGIndexManager:
                             )
                     logger.info(f"Added ${total_chunking_cost:.6f} chunking cost to KB {kb_id}")
 
-            # Step 3: Get all chunks from ChromaDB
-            all_chunks = self.get_all_chunks_for_kb(kb_id)
-            logger.info(f"Total chunks retrieved: {len(all_chunks)}")
+            # Step 3: Find which KB documents have chunks in ChromaDB. Only chunk metadata
+            # is read; the chunks themselves are never materialized for this check.
+            user_id = get_operation_user_id()
+            indexed_doc_ids = self.chroma_store.get_indexed_doc_ids(
+                f"chunks_{user_id}", [d.doc_id for d in doc_models]
+            )
+            logger.info(f"Documents with indexed chunks: {len(indexed_doc_ids)}")
 
             # Step 4: Finalize index build
             processing_completed_at = datetime.now(timezone.utc)
-            self._finalize_index_build(kb_id, all_chunks, processing_completed_at)
+            self._finalize_index_build(kb_id, indexed_doc_ids, processing_completed_at)
 
         except Exception as e:
             logger.error(f"Critical error processing KB {kb_id}: {str(e)}", exc_info=True)
@@ -294,7 +300,7 @@ class RAGIndexManager:
 
             # Step 2: Finalize index build
             processing_completed_at = datetime.now(timezone.utc)
-            self._finalize_index_build(kb_id, chunks, processing_completed_at)
+            self._finalize_index_build(kb_id, indexed_doc_ids, processing_completed_at)
 
         except Exception as e:
             logger.error(f"Critical error building index for KB {kb_id}: {str(e)}", exc_info=True)
@@ -363,42 +369,45 @@ class RAGIndexManager:
         total_cost: float = 0.0
         content_ids: List[str] = []
         doc_ids: List[str] = []
-        all_chunk_ids: List[str] = []  # Track all chunks for rollback
+        pending_chunks: List[Chunk] = []  # Chunks of all files, added in one batch
+        chunked_doc_costs: Dict[str, float] = {}  # doc_id -> cost, flagged after the add
+
+        # Documents whose content is already chunked under another document copy those
+        # chunks instead of going through the FileProcessor again
+        reused_chunks = self._reuse_chunks_of_same_content(source_docs, kb_id)
+        for reused_doc_id, chunks in reused_chunks.items():
+            pending_chunks.extend(chunks)
+            chunked_doc_costs[reused_doc_id] = 0.0
+        if reused_chunks:
+            logger.info(
+                f"Reused existing chunks for {len(reused_chunks)} documents from source '{source}'"
+            )
 
+        # Issue all content reads up front so disk/S3 latency overlaps across documents
+        read_futures: Dict[str, Future[Optional[bytes]]] = {}
         for doc in source_docs:
-            try:
-                content_path = content_map.get(doc.content_id)
-                content_ids.append(doc.content_id)
-                if not content_path:
-                    logger.error(f"Content path not found for doc {doc.doc_id}")
-                    continue
-
-                # Read content from local disk or S3
-                content = None
-                full_path = os.path.join(self.docs_dir, content_path)
-
-                if os.path.exists(full_path):
-                    try:
-                        with open(full_path, "rb") as f:
-                            content = f.read()
-                        logger.debug(f"Loaded document content from disk for doc {doc.doc_id}")
-                    except Exception as e:
-                        logger.warning(f"Failed to read local file for doc {doc.doc_id}: {str(e)}")
-                else:
-                    logger.info(f"Local file not found at {full_path}, attempting S3")
-                    try:
-                        s3_key = f"documents/{content_path}"
-                        with S3Service() as s3_service:
-                            content = s3_service.download_file(s3_key)
-                        if content:
-                            logger.info(f"Downloaded document from S3 for doc {doc.doc_id}")
-                    except Exception as e:
-                        logger.error(f"Failed to fetch from S3 for doc {doc.doc_id}: {str(e)}")
+            content_path = content_map.get(doc.content_id)
+            content_ids.append(doc.content_id)
+            if doc.doc_id in reused_chunks:
+                continue
+            if not content_path:
+                logger.error(f"Content path not found for doc {doc.doc_id}")
+                continue
+            read_futures[doc.doc_id] = io_executor.submit(
+                copy_context().run, self._read_document_content, doc.doc_id, content_path
+            )
 
+        for doc in source_docs:
+            future = read_futures.get(doc.doc_id)
+            if future is None:
+                continue
+            try:
+                content = future.result()
                 if not content:
                     logger.error(f"Could not retrieve content for doc {doc.doc_id}")
                     continue
 
+                content_path = content_map[doc.content_id]
                 file_contents.append(
                     {
                         "content": content,
@@ -417,8 +426,11 @@ class RAGIndexManager:
 
         update_operation_metadata(
             {
-                "$addToSet": {"doc_ids": doc_ids, "content_ids": content_ids},
-                "$inc": {"docs_count": len(doc_ids)},
+                "$addToSet": {
+                    "doc_ids": doc_ids + list(reused_chunks),
+                    "content_ids": content_ids,
+                },
+                "$inc": {"docs_count": len(doc_ids) + len(reused_chunks)},
             }
         )
 
@@ -465,7 +477,6 @@ class RAGIndexManager:
                 filename = file_info.get("filename")
                 mapped_doc_id: Optional[str] = doc_id_map.get(filename)
                 file_hash = file_info.get("file_hash")
-                chunk_ids: List[str] = []
 
                 if not mapped_doc_id or not file_hash:
                     logger.error(f"Missing doc_id or file_hash for {filename} - Rolling back")
@@ -644,7 +655,6 @@ class RAGIndexManager:
                         text_content,
                         chunk_content_obj.get("chunk_order_index"),
                     )
-                    chunk_ids.append(chunk_id)
 
                     chunk_model = Chunk(
                         _id=chunk_id,
@@ -654,47 +664,14 @@ class RAGIndexManager:
                     )
                     chunk_models.append(chunk_model)
 
-                # Mark document as chunked
-                with self._db_lock:
-                    with get_db_session() as db:
-                        doc_cost = file_info.get("estimated_cost_usd", 0.0)
-                        db[Config.DOCUMENTS_COLLECTION].update_one(
-                            {"_id": mapped_doc_id, "user_id": get_operation_user_id()},
-                            {
-                                "$set": {
-                                    "chunked": True,
-                                    "estimated_cost_usd": doc_cost,
-                                }
-                            },
-                        )
+                # Flagged as chunked after the batched add below succeeds
+                chunked_doc_costs[mapped_doc_id] = file_info.get("estimated_cost_usd", 0.0)
 
-                # Store chunks in ChromaDB
-                user_id = get_operation_user_id()
-                collection_name = f"chunks_{user_id}"
+                # Queue chunks for a single batched ChromaDB add after all files are processed
                 # Add kb_id to each chunk's metadata for filtering/querying
                 for chunk in chunk_models:
                     chunk.metadata["kb_id"] = kb_id
-                try:
-                    added_ids = self.chroma_store.add_chunks(collection_name, chunk_models)
-                    all_chunk_ids.extend(added_ids)
-                    logger.info(
-                        f"Stored {len(chunk_models)} chunks in ChromaDB for doc {mapped_doc_id}"
-                    )
-                except Exception as chroma_error:
-                    logger.error(
-                        f"Failed to store chunks in ChromaDB for doc {mapped_doc_id}: {str(chroma_error)}",
-                        exc_info=True,
-                    )
-                    # Rollback all chunks added so far
-                    if all_chunk_ids:
-                        try:
-                            self.chroma_store.delete_chunks(collection_name, all_chunk_ids)
-                            logger.info(f"Rolled back {len(all_chunk_ids)} chunks from ChromaDB")
-                        except Exception as rollback_error:
-                            logger.error(
-                                f"Failed to rollback chunks: {str(rollback_error)}", exc_info=True
-                            )
-                    raise  # Re-raise to propagate the error
+                pending_chunks.extend(chunk_models)
 
                 total_cost += file_info.get("estimated_cost_usd", 0.0)
 
@@ -711,49 +688,134 @@ class RAGIndexManager:
                         },
                     )
 
-                update_operation_metadata(
-                    {
-                        "$addToSet": {"chunk_ids": chunk_ids},
-                        "$inc": {"new_chunks_count": len(chunk_ids)},
-                    }
+        # Store all chunks of this source in one add so embeddings are requested in full
+        # batches instead of one round-trip per document
+        if pending_chunks:
+            user_id = get_operation_user_id()
+            collection_name = f"chunks_{user_id}"
+            try:
+                added_ids = self.chroma_store.add_chunks(collection_name, pending_chunks)
+                logger.info(
+                    f"Stored {len(added_ids)} chunks in ChromaDB for source '{source}' "
+                    f"({len(doc_ids)} documents)"
+                )
+            except Exception as chroma_error:
+                # add_chunks has already removed the chunks it wrote, and no document was
+                # flagged as chunked yet, so the next build chunks them again
+                logger.error(
+                    f"Failed to store chunks in ChromaDB for source '{source}': {str(chroma_error)}",
+                    exc_info=True,
                 )
+                raise  # Re-raise to propagate the error
+
+            # Record the chunks in the operation audit only once they are stored
+            pending_chunk_ids = [c.chunk_id for c in pending_chunks]
+            update_operation_metadata(
+                {
+                    "$addToSet": {"chunk_ids": pending_chunk_ids},
+                    "$inc": {"new_chunks_count": len(pending_chunk_ids)},
+                }
+            )
+
+        if chunked_doc_costs:
+            with self._db_lock:
+                with get_db_session() as db:
+                    for chunked_doc_id, doc_cost in chunked_doc_costs.items():
+                        db[Config.DOCUMENTS_COLLECTION].update_one(
+                            {"_id": chunked_doc_id, "user_id": get_operation_user_id()},
+                            {
+                                "$set": {
+                                    "chunked": True,
+                                    "estimated_cost_usd": doc_cost,
+                                }
+                            },
+                        )
 
         logger.info(f"Completed chunking for source '{source}' with cost: ${total_cost:.6f}")
         return total_cost
 
-    def get_all_chunks_for_kb(self, kb_id: str) -> List[Chunk]:
-        """Retrieve all chunks for a knowledge base from ChromaDB."""
-        try:
-            # Get all doc_ids for the KB
-            with self._db_lock:
-                with get_db_session() as db:
-                    kb_entry = db[Config.KNOWLEDGE_BASES_COLLECTION].find_one(
+    def _reuse_chunks_of_same_content(
+        self, source_docs: List[Document], kb_id: str
+    ) -> Dict[str, List[Chunk]]:
+        """
+        Build chunks for documents whose content is already chunked under another document.
+
+        Identical bytes from the same source chunk identically, so the stored chunks of a
+        chunked document with the same content_id are copied under the new doc_id. Their
+        embeddings are reused too, as add_chunks does not re-embed stored texts.
+
+        Returns:
+            Dict mapping each reusing doc_id to its new chunks
+        """
+        user_id = get_operation_user_id()
+        doc_ids = {d.doc_id for d in source_docs}
+        with self._db_lock:
+            with get_db_session() as db:
+                donor_by_content = {
+                    d["content_id"]: d["_id"]
+                    for d in db[Config.DOCUMENTS_COLLECTION].find(
                         {
-                            "_id": kb_id,
-                            "user_id": get_operation_user_id(),
-                        }
+                            "content_id": {"$in": list({d.content_id for d in source_docs})},
+                            "user_id": user_id,
+                            "source": source_docs[0].source,
+                            "chunked": True,
+                        },
+                        {"_id": 1, "content_id": 1},
                     )
-                    if not kb_entry:
-                        return []
+                    if d["_id"] not in doc_ids
+                }
+        if not donor_by_content:
+            return {}
 
-                    doc_ids = kb_entry.get("doc_ids", [])
-                    if not doc_ids:
-                        return []
+        recipients_by_donor: Dict[str, List[Document]] = defaultdict(list)
+        for doc in source_docs:
+            donor_id = donor_by_content.get(doc.content_id)
+            if donor_id:
+                recipients_by_donor[donor_id].append(doc)
+
+        # Donor chunks are read shard by shard on this thread: this method already runs
+        # as a chunk_executor task and must not wait on work queued to the same pool
+        reused_chunks: Dict[str, List[Chunk]] = {}
+        for donor_id, chunks in self.chroma_store.iter_chunks_for_documents(
+            f"chunks_{user_id}", list(recipients_by_donor)
+        ):
+            for doc in recipients_by_donor[donor_id]:
+                reused_chunks[doc.doc_id] = [
+                    Chunk(
+                        _id=generate_chunk_id(
+                            doc.doc_id,
+                            chunk.content.get("text", ""),
+                            chunk.content.get("chunk_order_index"),
+                        ),
+                        doc_id=doc.doc_id,
+                        content=chunk.content,
+                        metadata={**chunk.metadata, "kb_id": kb_id},
+                    )
+                    for chunk in chunks
+                ]
+        return reused_chunks
 
-            # Get chunks for each document in order
-            if doc_ids:
-                user_id = get_operation_user_id()
-                collection_name = f"chunks_{user_id}"
-                all_chunks: List[Chunk] = []
+    def _read_document_content(self, doc_id: str, content_path: str) -> Optional[bytes]:
+        """Read document content from local disk, falling back to S3. Returns None on failure."""
+        content = None
+        full_path = os.path.join(self.docs_dir, content_path)
 
-                for doc_id in doc_ids:
-                    doc_chunks = self.chroma_store.get_document_chunks_in_order(
-                        collection_name=collection_name, doc_id=doc_id
-                    )
-                    all_chunks.extend(doc_chunks)
+        if os.path.exists(full_path):
+            try:
+                with open(full_path, "rb") as f:
+                    content = f.read()
+                logger.debug(f"Loaded document content from disk for doc {doc_id}")
+            except Exception as e:
+                logger.warning(f"Failed to read local file for doc {doc_id}: {str(e)}")
+        else:
+            logger.info(f"Local file not found at {full_path}, attempting S3")
+            try:
+                s3_key = f"documents/{content_path}"
+                with S3Service() as s3_service:
+                    content = s3_service.download_file(s3_key)
+                if content:
+                    logger.info(f"Downloaded document from S3 for doc {doc_id}")
+            except Exception as e:
+                logger.error(f"Failed to fetch from S3 for doc {doc_id}: {str(e)}")
 
-                return all_chunks
-            return []
-        except Exception as e:
-            logger.error(f"Failed to retrieve chunks for KB {kb_id}: {str(e)}")
-            return []
+        return content
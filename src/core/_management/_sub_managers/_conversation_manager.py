@@ -11,7 +11,6 @@
 # in the root directory of this source tree.
 # -----------------------------------------------------------------------------
 from typing import Dict, List, AsyncGenerator, Union, Optional, Any, cast
-import time
 import threading
 from datetime import datetime, timezone, timedelta
 import base64
@@ -96,11 +95,11 @@ class ConversationManager:
             logger.info(
                 f"[Session Cleanup] Started background cleanup thread (interval: {SESSION_CLEANUP_INTERVAL}s, timeout: {SESSION_INACTIVITY_TIMEOUT}s)"
             )
-            while not self.cleanup_shutdown.is_set():
+            # Waiting on the shutdown event (instead of sleeping) lets shutdown wake the
+            # thread immediately rather than after up to a full interval
+            while not self.cleanup_shutdown.wait(SESSION_CLEANUP_INTERVAL.seconds):
                 try:
-                    time.sleep(SESSION_CLEANUP_INTERVAL.seconds)
-                    if not self.cleanup_shutdown.is_set():
-                        self._cleanup_inactive_conversations()
+                    self._cleanup_inactive_conversations()
                 except Exception as e:
                     logger.error(f"[Session Cleanup] Error in cleanup loop: {e}")
 
@@ -609,16 +609,10 @@ class KnowledgeBaseManager:
                     docs_to_delete_models = [Document(**doc) for doc in docs_to_delete]
                     content_ids_to_check = [doc.content_id for doc in docs_to_delete_models]
 
-                    # Update documents with deleted flag and new IDs
-                    for doc_id in doc_ids:
-                        doc_entry = db[Config.DOCUMENTS_COLLECTION].find_one(
-                            {"_id": doc_id, "user_id": get_operation_user_id()}
-                        )
-                        if doc_entry:
-
-                            db[Config.DOCUMENTS_COLLECTION].delete_one(
-                                {"_id": doc_id, "user_id": get_operation_user_id()}
-                            )
+                    # Delete all document records in one statement
+                    db[Config.DOCUMENTS_COLLECTION].delete_many(
+                        {"_id": {"$in": doc_ids}, "user_id": get_operation_user_id()}
+                    )
 
                     # Delete chunks from ChromaDB for these documents
                     user_id = get_operation_user_id()
@@ -632,37 +626,43 @@ class KnowledgeBaseManager:
 
                     # Check and soft delete content if no other active documents use them
                     if content_ids_to_check:
-                        content_deleted_count = 0
-                        for content_id in content_ids_to_check:
-                            # Check if any other active (non-deleted) document is using this content
-                            other_docs_using_content = db[
-                                Config.DOCUMENTS_COLLECTION
-                            ].count_documents(
+                        unique_content_ids = list(dict.fromkeys(content_ids_to_check))
+                        # Contents still referenced by any other active document are kept
+                        contents_in_use = {
+                            d["content_id"]
+                            for d in db[Config.DOCUMENTS_COLLECTION].find(
                                 {
-                                    "content_id": content_id,
-                                    # "deleted": {"$ne": True},
+                                    "content_id": {"$in": unique_content_ids},
                                     "user_id": get_operation_user_id(),
-                                }
+                                },
+                                {"content_id": 1},
                             )
+                        }
+                        unused_content_ids = [
+                            c for c in unique_content_ids if c not in contents_in_use
+                        ]
 
-                            if other_docs_using_content == 0:
-                                # No other active document is using this content, soft delete it
-                                content_entry = db[Config.DOCUMENT_CONTENTS_COLLECTION].find_one(
+                        content_deleted_count = 0
+                        if unused_content_ids:
+                            existing_content_ids = [
+                                c["_id"]
+                                for c in db[Config.DOCUMENT_CONTENTS_COLLECTION].find(
+                                    {
+                                        "_id": {"$in": unused_content_ids},
+                                        "user_id": get_operation_user_id(),
+                                    },
+                                    {"_id": 1},
+                                )
+                            ]
+                            if existing_content_ids:
+                                deleted_content_ids.extend(existing_content_ids)
+                                db[Config.DOCUMENT_CONTENTS_COLLECTION].delete_many(
                                     {
-                                        "_id": content_id,
+                                        "_id": {"$in": existing_content_ids},
                                         "user_id": get_operation_user_id(),
                                     }
                                 )
-                                if content_entry:
-                                    deleted_content_ids.append(content_id)
-
-                                    db[Config.DOCUMENT_CONTENTS_COLLECTION].delete_one(
-                                        {
-                                            "_id": content_id,
-                                            "user_id": get_operation_user_id(),
-                                        }
-                                    )
-                                    content_deleted_count += 1
+                                content_deleted_count = len(existing_content_ids)
 
                         if content_deleted_count > 0:
                             logger.info(
@@ -1754,27 +1754,31 @@ class KnowledgeBaseManager:
             logger.warning(f"Expected file not found: {full_path}")
             return False
 
-        CHUNK_SIZE = 8 * 1024 * 1024  # 8MB chunks for memory efficiency
+        CHUNK_SIZE = 1024 * 1024  # 1MB chunks for memory efficiency
 
         try:
-            with open(full_path, "rb") as existing_file:
+            # Read into one reused buffer and compare through memoryviews, so neither
+            # side allocates a new bytes object per chunk
+            buffer = bytearray(CHUNK_SIZE)
+            buffer_view = memoryview(buffer)
+            new_view = memoryview(new_content)
+            with open(full_path, "rb", buffering=0) as existing_file:
                 new_offset = 0
                 while True:
-                    existing_chunk = existing_file.read(CHUNK_SIZE)
-                    new_chunk = new_content[new_offset : new_offset + CHUNK_SIZE]
+                    read_size = existing_file.readinto(buffer)
+
+                    # End of file check
+                    if not read_size:
+                        break
 
                     # Compare chunks
-                    if existing_chunk != new_chunk:
+                    if buffer_view[:read_size] != new_view[new_offset : new_offset + read_size]:
                         logger.debug(f"Content mismatch detected at offset {new_offset}")
                         return False  # Collision detected
 
-                    # End of file check
-                    if not existing_chunk:
-                        break
-
-                    new_offset += CHUNK_SIZE
+                    new_offset += read_size
 
-            return True  # Files are identical
+            return new_offset == len(new_content)  # Files are identical if fully consumed
 
         except IOError as e:
             logger.error(f"Error verifying content match: {str(e)}")
@@ -1955,15 +1959,19 @@ class KnowledgeBaseManager:
             {}
         )  # hash -> (content_id, storage_path, variant_id)
 
+        valid_docs: List[Doc] = []
         for doc in docs:
             if not doc.doc_name or not doc.content:
                 logger.warning(f"Skipping invalid document: {getattr(doc, 'doc_name', 'unknown')}")
                 continue
+            valid_docs.append(doc)
 
+        content_hashes = self._hash_contents_in_parallel([doc.content for doc in valid_docs])
+
+        for doc, content_hash in zip(valid_docs, content_hashes):
             # Generate IDs
             doc_id = generate_document_id()
             content_bytes = doc.content
-            content_hash = sha256_hex(content_bytes)
 
             # Resolve content with collision-safe deduplication
             if content_hash not in processed_hashes:
@@ -2074,6 +2082,14 @@ class KnowledgeBaseManager:
                 )
         return existing_content_ids, existing_doc_ids, current_kb_doc_ids
 
+    def _hash_contents_in_parallel(self, contents: List[bytes]) -> List[str]:
+        """Compute SHA-256 content hashes in parallel (hashlib releases the GIL while hashing)."""
+        if len(contents) <= 1:
+            return [sha256_hex(content) for content in contents]
+
+        hash_futures = [executor.submit(sha256_hex, content) for content in contents]
+        return [future.result() for future in hash_futures]
+
     def _write_files_in_parallel(self, new_content_to_write: List[Dict[str, Any]]):
         """Write files in parallel with thread-safe operations using hierarchical storage."""
         file_write_futures: List[Future[None]] = []
@@ -86,6 +86,7 @@ class ModelServerClient:
         input_texts: Union[str, List[str]],
         model: str = "text-embedding-3-small",
         timeout: Optional[int] = None,
+        dimensions: Optional[int] = None,
     ) -> List[List[float]]:
         """
         Create embeddings using Azure OpenAI embedding model.
@@ -94,6 +95,7 @@ class ModelServerClient:
             input_texts: Single text string or list of text strings to embed
             model: Model name (default: "text-embedding-3-small")
             timeout: Request timeout in seconds
+            dimensions: Optional output size for text-embedding-3 models (shortened vectors)
 
         Returns:
             List of embeddings (each embedding is a list of floats)
@@ -108,6 +110,8 @@ class ModelServerClient:
             input_texts = [input_texts]
 
         payload: Dict[str, Any] = {"input": input_texts, "model": model}
+        if dimensions is not None:
+            payload["dimensions"] = dimensions
 
         response = self._make_request(
             payload=payload,
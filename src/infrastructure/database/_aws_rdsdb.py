@@ -1,3 +1,4 @@
+import threading
 import pymysql
 from typing import Any, Optional, Type, Dict, List
 from types import TracebackType
@@ -251,9 +252,24 @@ class DatabaseManager:
 
 
 # Global database manager instance
+_db_manager_instance: Optional[DatabaseManager] = None
+_db_manager_lock = threading.Lock()
+
+
 def get_db_manager() -> DatabaseManager:
     """Get or create the global database manager"""
-    return DatabaseManager()
+    global _db_manager_instance
+
+    # Fast path for subsequent calls (every DBSession asks for the manager)
+    if _db_manager_instance is not None:
+        return _db_manager_instance
+
+    # Double-checked locking so concurrent first calls create the database only once
+    with _db_manager_lock:
+        if _db_manager_instance is None:
+            _db_manager_instance = DatabaseManager()
+
+    return _db_manager_instance
 
 
 class DBSession:
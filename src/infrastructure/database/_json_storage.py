@@ -13,26 +13,59 @@
 
 # src/infrastructure/storage/json_storage.py
 import os
-import json
 import tempfile
-import shutil
 import threading
 import re
+import uuid
+from collections import defaultdict
 from types import TracebackType
-from typing import Any, Dict, List, Optional, Type, Union
-from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple, Type, Union
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
 
+import orjson
+from pymongo.errors import DuplicateKeyError
+
 from ...log_creator import get_file_logger
 
 logger = get_file_logger()
 
+# Write-ahead log size at which a collection file is compacted into a new snapshot
+WAL_COMPACT_BYTES = 4 * 1024 * 1024
+
+# Buffer size for JSONStorage file I/O (8 KiB default means 8x the syscalls)
+IO_BUFFER_SIZE = 64 * 1024
+
+# (mtime_ns, size) of a collection snapshot and of its WAL; None when the file is absent
+_FileSignature = Tuple[Optional[Tuple[int, int]], Optional[Tuple[int, int]]]
+
+# Datetimes are passed through to default=str so stored values keep their existing format
+_ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+)
+
+
+def _dumps(data: Any, option: int = 0) -> bytes:
+    """Serialize data to JSON bytes (non-JSON values fall back to their string form)"""
+    return orjson.dumps(data, default=str, option=_ORJSON_OPTIONS | option)
+
+
+def _clone(data: Any) -> Any:
+    """Deep-copy JSON-native data (everything held in memory is) via an orjson round-trip"""
+    return orjson.loads(orjson.dumps(data))
+
 
 class JSONStorage:
     """
     Thread-safe JSON-based storage with atomic writes and file locking.
     Provides a MongoDB-like interface for storing and querying data in JSON files.
     Optimized for parallel access with per-entity and per-document granular locking.
+
+    Each collection file is loaded into memory once. Changes are appended to a JSON-lines
+    write-ahead log next to it (one record per changed document) and folded into the JSON
+    snapshot when the log grows past WAL_COMPACT_BYTES, so a write costs O(changed
+    documents) instead of a rewrite of the whole file. Files are assumed to be written by
+    a single process.
     """
 
     _file_locks: Dict[str, threading.Lock] = {}
@@ -49,6 +82,11 @@ class JSONStorage:
         self.storage_dir = Path(storage_dir)
         self.storage_dir.mkdir(parents=True, exist_ok=True)
         self.enable_sharding = enable_sharding
+        # In-memory collections (snapshot + replayed WAL), keyed by collection file path
+        self._collections: Dict[str, Dict[str, Any]] = {}
+        # (mtime_ns, size) of each cached file's snapshot and WAL when it was last
+        # read or written here; a mismatch means another process changed the file
+        self._file_signatures: Dict[str, _FileSignature] = {}
         logger.info(
             f"Initialized JSON storage at: {self.storage_dir} (sharding={'enabled' if enable_sharding else 'disabled'})"
         )
@@ -83,40 +121,25 @@ class JSONStorage:
 
         try:
             # Write to temp file
-            with os.fdopen(fd, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+            with os.fdopen(fd, "wb", buffering=IO_BUFFER_SIZE) as f:
+                f.write(_dumps(data, orjson.OPT_INDENT_2))
                 f.flush()
                 os.fsync(f.fileno())  # Ensure data is written to disk
 
-            # Atomic rename - this is the key operation
-            # On POSIX systems, rename is atomic
+            # Atomic replace - this is the key operation
+            # os.replace atomically swaps the file on POSIX and Windows alike, so readers
+            # see either the old or the new contents and never a missing file
             # If process is killed before this, original file is untouched
-            # If process is killed during this, rename completes or doesn't happen
-            if os.path.exists(filename):
-                # On Windows, need to handle existing file differently
-                if os.name == "nt":
-                    # Create backup first
-                    backup_path = filename + ".bak"
-                    if os.path.exists(backup_path):
-                        os.remove(backup_path)
-                    shutil.copy2(filename, backup_path)
-                    try:
-                        os.replace(temp_path, filename)
-                        # Remove backup on success
-                        if os.path.exists(backup_path):
-                            os.remove(backup_path)
-                    except Exception as e:
-                        # Restore from backup if rename fails
-                        if os.path.exists(backup_path):
-                            shutil.copy2(backup_path, filename)
-                            os.remove(backup_path)
-                        raise
-                else:
-                    # POSIX systems - atomic rename
-                    os.replace(temp_path, filename)
-            else:
-                # No existing file, simple rename
-                os.rename(temp_path, filename)
+            os.replace(temp_path, filename)
+
+            if os.name != "nt":
+                # Persist the directory entry too, so the new snapshot is durable before
+                # the caller drops the write-ahead log it replaces
+                dir_fd = os.open(file_dir, os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
 
             logger.debug(f"Atomically wrote data to {filename}")
 
@@ -136,9 +159,10 @@ class JSONStorage:
             return None
 
         try:
-            with open(filename, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError as e:
+            # Unbuffered: read() sizes one buffer from fstat and fills it directly
+            with open(filename, "rb", buffering=0) as f:
+                return orjson.loads(f.read())
+        except orjson.JSONDecodeError as e:
             logger.error(f"Failed to decode JSON from {filename}: {e}")
             return None
         except Exception as e:
@@ -161,18 +185,141 @@ class JSONStorage:
         else:
             return str(self.storage_dir / f"{collection_name}.json")
 
+    def _wal_path(self, file_path: str) -> str:
+        """Get the write-ahead log path belonging to a collection file"""
+        return file_path + ".wal"
+
+    def _file_signature(self, file_path: str) -> _FileSignature:
+        """Stat a collection file and its write-ahead log as (mtime_ns, size) pairs"""
+        stats: List[Optional[Tuple[int, int]]] = []
+        for path in (file_path, self._wal_path(file_path)):
+            try:
+                st = os.stat(path)
+                stats.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stats.append(None)
+        return stats[0], stats[1]
+
+    def _load_file(self, file_path: str) -> Dict[str, Any]:
+        """
+        Get the in-memory collection for a file, loading its snapshot and replaying its
+        write-ahead log on first access. Caller must hold the file lock.
+        """
+        signature = self._file_signature(file_path)
+        collection = self._collections.get(file_path)
+        if collection is not None and self._file_signatures.get(file_path) == signature:
+            return collection
+
+        collection = self._read_json(file_path) or {}
+        wal_path = self._wal_path(file_path)
+        torn_record = False
+        if signature[1] is not None:
+            with open(wal_path, "rb", buffering=IO_BUFFER_SIZE) as f:
+                for line_number, line in enumerate(f, 1):
+                    try:
+                        record = orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        # Only the last record can be torn (crash mid-append)
+                        logger.warning(f"Ignoring torn WAL record {line_number} in {wal_path}")
+                        torn_record = True
+                        break
+                    if record["op"] == "delete":
+                        collection.pop(record["_id"], None)
+                    else:
+                        collection[record["_id"]] = record["doc"]
+
+        self._collections[file_path] = collection
+        self._file_signatures[file_path] = signature
+        if torn_record:
+            # Compact right away so new records are not appended after the torn one
+            self._write_snapshot(file_path, collection)
+        return collection
+
+    def _append_wal(
+        self,
+        file_path: str,
+        upserts: Optional[Dict[str, Dict[str, Any]]] = None,
+        deletes: Optional[List[str]] = None,
+    ) -> None:
+        """
+        Persist changed documents of a collection file as write-ahead log records and
+        publish them to the in-memory collection. Caller must hold the file lock.
+
+        Args:
+            file_path: Collection file the changes belong to
+            upserts: Documents to insert or replace, keyed by document ID
+            deletes: IDs of deleted documents
+        """
+        collection = self._load_file(file_path)
+        records: List[bytes] = []
+        for doc_id, doc in (upserts or {}).items():
+            record = _dumps({"op": "upsert", "_id": doc_id, "doc": doc})
+            # Cache the document as it reads back from disk, detached from caller objects
+            collection[doc_id] = orjson.loads(record)["doc"]
+            records.append(record)
+        for doc_id in deletes or []:
+            collection.pop(doc_id, None)
+            records.append(_dumps({"op": "delete", "_id": doc_id}))
+
+        if not records:
+            return
+
+        wal_path = self._wal_path(file_path)
+        try:
+            os.makedirs(os.path.dirname(wal_path) or ".", exist_ok=True)
+            with open(wal_path, "ab", buffering=IO_BUFFER_SIZE) as f:
+                f.write(b"\n".join(records) + b"\n")
+                f.flush()
+                os.fsync(f.fileno())  # Ensure data is written to disk
+
+            signature = self._file_signature(file_path)
+            self._file_signatures[file_path] = signature
+            if signature[1] is not None and signature[1][1] >= WAL_COMPACT_BYTES:
+                self._write_snapshot(file_path, collection)
+        except Exception as e:
+            # Drop the in-memory copy so the next access reloads what actually reached disk
+            self._collections.pop(file_path, None)
+            logger.error(f"Error appending to WAL {wal_path}: {e}")
+            raise
+
+    def _write_snapshot(self, file_path: str, data: Dict[str, Any]) -> None:
+        """
+        Atomically rewrite a collection file with its full contents and truncate its
+        write-ahead log. Caller must hold the file lock.
+        """
+        self._atomic_write_json(data, file_path)
+        # Replaying a leftover log over the new snapshot is harmless: records are idempotent
+        wal_path = self._wal_path(file_path)
+        if os.path.exists(wal_path):
+            os.remove(wal_path)
+        self._collections[file_path] = data
+        self._file_signatures[file_path] = self._file_signature(file_path)
+        logger.debug(f"Compacted {file_path}")
+
+    def compact(self, collection_name: str, shard_key: Optional[str] = None) -> None:
+        """
+        Fold a collection's write-ahead log into its JSON snapshot.
+
+        Args:
+            collection_name: Name of the collection
+            shard_key: Optional shard key when sharding is enabled
+        """
+        file_path = self._get_collection_path(collection_name, shard_key)
+        lock = self._get_file_lock(file_path)
+
+        with lock:
+            self._write_snapshot(file_path, self._load_file(file_path))
+
     def _load_collection(
         self, collection_name: str, shard_key: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Load entire collection from JSON file (with optional sharding)"""
+        """Load entire collection (with optional sharding) as a point-in-time view"""
         file_path = self._get_collection_path(collection_name, shard_key)
         lock = self._get_file_lock(file_path)
 
         with lock:
-            data = self._read_json(file_path)
-            if data is None:
-                return {}
-            return data
+            # Shallow copy: cached documents are replaced, never mutated, on update
+            return dict(self._load_file(file_path))
 
     def _save_collection(
         self, collection_name: str, data: Dict[str, Any], shard_key: Optional[str] = None
@@ -182,7 +329,9 @@ class JSONStorage:
         lock = self._get_file_lock(file_path)
 
         with lock:
-            self._atomic_write_json(data, file_path)
+            self._write_snapshot(file_path, data)
+            # Reload from disk on next access so cached values match their JSON form
+            self._collections.pop(file_path, None)
 
     def _load_all_shards(self, collection_name: str) -> Dict[str, Dict[str, Any]]:
         """Load all shards for a collection and merge them"""
@@ -193,11 +342,19 @@ class JSONStorage:
         if not shard_dir.exists():
             return {}
 
+        # One scandir pass over the shard directory; a shard may exist only as a WAL
+        # until it is first compacted
+        shard_keys = set()
+        with os.scandir(shard_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json"):
+                    shard_keys.add(entry.name[: -len(".json")])
+                elif entry.name.endswith(".json.wal"):
+                    shard_keys.add(entry.name[: -len(".json.wal")])
+
         merged_data: Dict[str, Dict[str, Any]] = {}
-        for shard_file in shard_dir.glob("*.json"):
-            shard_data = self._read_json(str(shard_file))
-            if shard_data:
-                merged_data.update(shard_data)
+        for shard_key in shard_keys:
+            merged_data.update(self._load_collection(collection_name, shard_key))
 
         return merged_data
 
@@ -213,9 +370,10 @@ class JSONStorage:
             # Load all shards
             collection = self._load_all_shards(collection_name)
 
-        for _, doc in collection.items():
+        for _, doc in self._candidates(collection, query):
             if self._matches_query(doc, query):
-                return doc
+                # Hand out a copy so callers cannot modify the cached document
+                return _clone(doc)
 
         return None
 
@@ -238,13 +396,38 @@ class JSONStorage:
 
         results: List[Dict[str, Any]] = []
 
-        for _, doc in collection.items():
+        for _, doc in self._candidates(collection, query):
             if query is None or self._matches_query(doc, query):
                 if projection:
                     doc = self.apply_projection(doc, projection)
                 results.append(doc)
 
-        return results
+        # Hand out copies so callers cannot modify the cached documents
+        return _clone(results)
+
+    def _candidates(
+        self, collection: Dict[str, Dict[str, Any]], query: Optional[Dict[str, Any]]
+    ) -> Iterable[Tuple[str, Dict[str, Any]]]:
+        """
+        Narrow a collection to the documents a query can match. Documents are keyed by _id,
+        so an _id equality or $in condition is a direct lookup instead of a full scan.
+        Callers still check the whole query against every candidate.
+        """
+        id_condition = query.get("_id") if query else None
+        if isinstance(id_condition, str):
+            doc = collection.get(id_condition)
+            return [(id_condition, doc)] if doc is not None else []
+        if (
+            isinstance(id_condition, dict)
+            and list(id_condition) == ["$in"]
+            and all(isinstance(i, str) for i in id_condition["$in"])
+        ):
+            return [
+                (doc_id, collection[doc_id])
+                for doc_id in dict.fromkeys(id_condition["$in"])
+                if doc_id in collection
+            ]
+        return collection.items()
 
     def _extract_shard_key(self, query: Dict[str, Any]) -> Optional[str]:
         """Extract entity_id from query for sharding"""
@@ -289,24 +472,22 @@ class JSONStorage:
         # Hold lock for entire load-modify-save operation to prevent race conditions
         with lock:
             # Load the appropriate shard
-            collection: Optional[Dict[str, Dict[str, Any]]] = self._read_json(file_path)
-            if collection is None:
-                collection = {}
+            collection = self._load_file(file_path)
 
             # Find matching document
             matched_id = None
-            for doc_id, doc in collection.items():
+            for doc_id, doc in self._candidates(collection, query):
                 if self._matches_query(doc, query):
                     matched_id = doc_id
                     matched_count = 1
                     break
 
             if matched_id:
-                # Update existing document
-                doc = collection[matched_id]
+                # Update a copy of the document; the cached one may be in use by readers
+                doc = _clone(collection[matched_id])
                 if self._apply_update(doc, update):
                     modified_count = 1
-                self._atomic_write_json(collection, file_path)
+                    self._append_wal(file_path, upserts={matched_id: doc})
             elif upsert:
                 # Insert new document
                 new_doc: Dict[str, Any] = {}
@@ -323,10 +504,7 @@ class JSONStorage:
                 # Apply $addToSet if present
                 if "$addToSet" in update:
                     for field, value in update["$addToSet"].items():
-                        if field not in new_doc:
-                            new_doc[field] = []
-                        if value not in new_doc[field]:
-                            new_doc[field].append(value)
+                        self._add_to_set(new_doc.setdefault(field, []), value)
 
                 # Generate ID from query or use a default
                 doc_id = (
@@ -336,12 +514,63 @@ class JSONStorage:
                     or str(len(collection))
                 )
                 new_doc["_id"] = doc_id
-                collection[doc_id] = new_doc
-                self._atomic_write_json(collection, file_path)
+                self._append_wal(file_path, upserts={doc_id: new_doc})
                 modified_count = 1
 
         return {"matched_count": matched_count, "modified_count": modified_count}
 
+    def insert_many(
+        self, collection_name: str, documents: List[Dict[str, Any]], ordered: bool = True
+    ) -> int:
+        """
+        Insert many new documents by _id, with one write per collection file.
+
+        Args:
+            collection_name: Name of the collection
+            documents: Documents to store; each must carry an _id
+            ordered: If True, stop at the first duplicate _id; if False, insert every
+                other document first (as pymongo does)
+
+        Returns:
+            Number of inserted documents
+
+        Raises:
+            DuplicateKeyError: If an _id already exists or repeats within documents, after
+                the documents before it (ordered) or all other documents (unordered) are stored
+        """
+        entries: List[Tuple[str, str, Dict[str, Any]]] = []
+        for doc in documents:
+            doc_id = doc.get("_id")
+            if doc_id is None:
+                raise ValueError(f"Document without _id passed to insert_many on {collection_name}")
+            file_path = self._get_collection_path(collection_name, self._extract_shard_key(doc))
+            entries.append((file_path, str(doc_id), doc))
+
+        inserts_by_file: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(dict)
+        duplicate_ids: List[str] = []
+        # Hold every affected file lock (in a fixed order) so no other writer can add one
+        # of these _ids between the duplicate check and the write
+        with ExitStack() as stack:
+            for file_path in sorted({entry[0] for entry in entries}):
+                stack.enter_context(self._get_file_lock(file_path))
+            for file_path, doc_id, doc in entries:
+                inserts = inserts_by_file[file_path]
+                if doc_id in inserts or doc_id in self._load_file(file_path):
+                    duplicate_ids.append(doc_id)
+                    if ordered:
+                        break
+                    continue
+                inserts[doc_id] = doc
+            for file_path, inserts in inserts_by_file.items():
+                if inserts:
+                    self._append_wal(file_path, upserts=inserts)
+
+        if duplicate_ids:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {collection_name} _id: {duplicate_ids}"
+            )
+        return sum(len(inserts) for inserts in inserts_by_file.values())
+
     def _extract_shard_key_from_update(self, update: Dict[str, Any]) -> Optional[str]:
         """Extract shard key from update operations"""
         if not self.enable_sharding:
@@ -383,35 +612,40 @@ class JSONStorage:
         matched_count = 0
         modified_count = 0
 
-        if shard_key:
-            # Single shard - hold lock for entire operation
+        if shard_key or not self.enable_sharding:
+            # Single file - hold lock for entire operation
             file_path = self._get_collection_path(collection_name, shard_key)
             lock = self._get_file_lock(file_path)
             with lock:
-                collection: Optional[Dict[str, Dict[str, Any]]] = self._read_json(file_path)
-                if collection is None:
-                    collection = {}
+                collection = self._load_file(file_path)
 
-                for _, doc in collection.items():
+                modified_docs: Dict[str, Dict[str, Any]] = {}
+                for doc_id, doc in self._candidates(collection, query):
                     if self._matches_query(doc, query):
                         matched_count += 1
+                        # Update a copy; the cached document may be in use by readers
+                        doc = _clone(doc)
                         if self._apply_update(doc, update):
-                            modified_count += 1
+                            modified_docs[doc_id] = doc
 
-                if modified_count > 0:
-                    self._atomic_write_json(collection, file_path)
+                modified_count = len(modified_docs)
+                if modified_docs:
+                    self._append_wal(file_path, upserts=modified_docs)
         else:
             # Multiple shards - need to handle each shard's lock
             collection = self._load_all_shards(collection_name)
 
-            for _, doc in collection.items():
+            changes: List[Tuple[str, Dict[str, Any], Optional[Dict[str, Any]]]] = []
+            for doc_id, doc in self._candidates(collection, query):
                 if self._matches_query(doc, query):
                     matched_count += 1
-                    if self._apply_update(doc, update):
-                        modified_count += 1
+                    new_doc = _clone(doc)
+                    if self._apply_update(new_doc, update):
+                        changes.append((doc_id, doc, new_doc))
 
-            if modified_count > 0:
-                self._save_sharded_collection(collection_name, collection)
+            modified_count = len(changes)
+            if changes:
+                self._write_sharded_changes(collection_name, changes)
 
         return {"matched_count": matched_count, "modified_count": modified_count}
 
@@ -421,30 +655,32 @@ class JSONStorage:
 
         deleted_count = 0
 
-        if shard_key:
-            # Single shard - hold lock for entire operation
+        if shard_key or not self.enable_sharding:
+            # Single file - hold lock for entire operation
             file_path = self._get_collection_path(collection_name, shard_key)
             lock = self._get_file_lock(file_path)
             with lock:
-                collection: Optional[Dict[str, Dict[str, Any]]] = self._read_json(file_path)
-                if collection is None:
-                    collection = {}
-
-                for doc_id, doc in list(collection.items()):
-                    if self._matches_query(doc, query):
-                        del collection[doc_id]
-                        deleted_count = 1
-                        self._atomic_write_json(collection, file_path)
-                        break
+                collection = self._load_file(file_path)
+
+                deleted_id = next(
+                    (
+                        doc_id
+                        for doc_id, doc in self._candidates(collection, query)
+                        if self._matches_query(doc, query)
+                    ),
+                    None,
+                )
+                if deleted_id is not None:
+                    deleted_count = 1
+                    self._append_wal(file_path, deletes=[deleted_id])
         else:
-            # Multiple shards - load all and save back
+            # Multiple shards - delete from the shard holding the document
             collection = self._load_all_shards(collection_name)
 
-            for doc_id, doc in list(collection.items()):
+            for doc_id, doc in self._candidates(collection, query):
                 if self._matches_query(doc, query):
-                    del collection[doc_id]
                     deleted_count = 1
-                    self._save_sharded_collection(collection_name, collection)
+                    self._write_sharded_changes(collection_name, [(doc_id, doc, None)])
                     break
 
         return {"deleted_count": deleted_count}
@@ -455,80 +691,102 @@ class JSONStorage:
 
         deleted_count = 0
 
-        if shard_key:
-            # Single shard - hold lock for entire operation
+        if shard_key or not self.enable_sharding:
+            # Single file - hold lock for entire operation
             file_path = self._get_collection_path(collection_name, shard_key)
             lock = self._get_file_lock(file_path)
             with lock:
-                collection: Optional[Dict[str, Dict[str, Any]]] = self._read_json(file_path)
-                if collection is None:
-                    collection = {}
+                collection = self._load_file(file_path)
 
-                for doc_id, doc in list(collection.items()):
-                    if self._matches_query(doc, query):
-                        del collection[doc_id]
-                        deleted_count += 1
+                deleted_ids = [
+                    doc_id
+                    for doc_id, doc in self._candidates(collection, query)
+                    if self._matches_query(doc, query)
+                ]
+                deleted_count = len(deleted_ids)
 
-                if deleted_count > 0:
-                    self._atomic_write_json(collection, file_path)
+                if deleted_ids:
+                    self._append_wal(file_path, deletes=deleted_ids)
         else:
-            # Multiple shards - load all and save back
+            # Multiple shards - delete from the shards holding the documents
             collection = self._load_all_shards(collection_name)
 
-            for doc_id, doc in list(collection.items()):
-                if self._matches_query(doc, query):
-                    del collection[doc_id]
-                    deleted_count += 1
-
-            if deleted_count > 0:
-                self._save_sharded_collection(collection_name, collection)
+            changes = [
+                (doc_id, doc, None)
+                for doc_id, doc in self._candidates(collection, query)
+                if self._matches_query(doc, query)
+            ]
+            deleted_count = len(changes)
+            if changes:
+                self._write_sharded_changes(collection_name, changes)
 
         return {"deleted_count": deleted_count}
 
-    def _save_sharded_collection(self, collection_name: str, collection: Dict[str, Any]) -> None:
-        """Save collection data back to appropriate shards based on entity_ids"""
-        if not self.enable_sharding:
-            self._save_collection(collection_name, collection)
-            return
+    @staticmethod
+    def _doc_shard_key(doc: Dict[str, Any]) -> Optional[str]:
+        """Determine which shard a document belongs to based on its entity_id(s)"""
+        if "entity_id" in doc:
+            return doc["entity_id"]
+        entity_ids = doc.get("entity_ids")
+        if isinstance(entity_ids, list) and len(entity_ids) > 0:  # type: ignore
+            return entity_ids[0]
+        return None
+
+    def _write_sharded_changes(
+        self,
+        collection_name: str,
+        changes: Iterable[Tuple[str, Dict[str, Any], Optional[Dict[str, Any]]]],
+    ) -> None:
+        """
+        Persist changed documents to the shards they belong to. Only shards holding a
+        changed document are touched, and only with WAL records for those documents,
+        instead of rewriting every shard of the collection.
 
-        # Group documents by entity_id
-        shards: Dict[str, Dict[str, Any]] = {}
-
-        for doc_id, doc in collection.items():
-            # Determine which shard this document belongs to
-            doc_shard_key = None
-            if "entity_id" in doc:
-                doc_shard_key = doc["entity_id"]
-            elif (
-                "entity_ids" in doc
-                and isinstance(doc["entity_ids"], list)
-                and len(doc["entity_ids"]) > 0
-            ):
-                doc_shard_key = doc["entity_ids"][0]
-
-            if doc_shard_key:
-                if doc_shard_key not in shards:
-                    shards[doc_shard_key] = {}
-                shards[doc_shard_key][doc_id] = doc
-
-        # Save each shard
-        for shard_key, shard_data in shards.items():
-            self._save_collection(collection_name, shard_data, shard_key)
+        Args:
+            collection_name: Name of the collection
+            changes: (doc_id, old_doc, new_doc) tuples; new_doc is None for deletions
+        """
+        upserts: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(dict)
+        deletes: Dict[str, List[str]] = defaultdict(list)
+        for doc_id, old_doc, new_doc in changes:
+            old_shard_key = self._doc_shard_key(old_doc)
+            new_shard_key = self._doc_shard_key(new_doc) if new_doc is not None else None
+            if new_doc is not None and new_shard_key:
+                upserts[new_shard_key][doc_id] = new_doc
+            # Remove the old copy when the document is deleted or moves to another shard
+            if old_shard_key and old_shard_key != new_shard_key:
+                deletes[old_shard_key].append(doc_id)
+
+        for shard_key in upserts.keys() | deletes.keys():
+            file_path = self._get_collection_path(collection_name, shard_key)
+            with self._get_file_lock(file_path):
+                self._append_wal(
+                    file_path, upserts=upserts.get(shard_key), deletes=deletes.get(shard_key)
+                )
 
     def aggregate(
         self, collection_name: str, pipeline: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
         """Basic aggregation support"""
         collection = self._load_collection(collection_name)
-        docs = list(collection.values())
+        # Stages are chained lazily, so a $match feeding a $group filters and groups in one
+        # pass without materializing the matched documents
+        docs: Iterable[Dict[str, Any]] = collection.values()
 
         for stage in pipeline:
             if "$match" in stage:
-                docs = [d for d in docs if self._matches_query(d, stage["$match"])]
+                docs = self._match_stage(docs, stage["$match"])
             elif "$group" in stage:
                 docs = self._group_stage(docs, stage["$group"])
 
-        return docs
+        # Hand out copies so callers cannot modify the cached documents
+        return _clone(list(docs))
+
+    def _match_stage(
+        self, docs: Iterable[Dict[str, Any]], query: Dict[str, Any]
+    ) -> Iterator[Dict[str, Any]]:
+        """Apply $match aggregation stage"""
+        return (doc for doc in docs if self._matches_query(doc, query))
 
     def _matches_query(
         self, doc: Dict[str, Any], query: Dict[str, Union[List[Dict[str, Any]], Dict[str, Any]]]
@@ -655,8 +913,7 @@ class JSONStorage:
                     doc[key] = []
                 if not isinstance(doc[key], list):
                     doc[key] = [doc[key]]
-                if value not in doc[key]:
-                    doc[key].append(value)
+                if self._add_to_set(doc[key], value):
                     modified = True
 
         if "$setOnInsert" in update:
@@ -665,6 +922,37 @@ class JSONStorage:
 
         return modified
 
+    @staticmethod
+    def _add_to_set(values: List[Any], value: Any) -> bool:
+        """
+        Append value to a list unless already present, MongoDB $addToSet style.
+        Supports {"$each": [...]} to add several values in one pass.
+
+        Returns:
+            True if the list was modified
+        """
+        if not (isinstance(value, dict) and "$each" in value):
+            if value in values:
+                return False
+            values.append(value)
+            return True
+
+        # Hash existing values once instead of scanning the list for every new value;
+        # unhashable values (dicts, lists) fall back to a list scan
+        new_values = value["$each"]
+        seen = {v for v in values if isinstance(v, Hashable)}
+        modified = False
+        for new_value in new_values:
+            if isinstance(new_value, Hashable):
+                if new_value in seen:
+                    continue
+                seen.add(new_value)
+            elif new_value in values:
+                continue
+            values.append(new_value)
+            modified = True
+        return modified
+
     def _set_nested_value(self, doc: Dict[str, Any], key: str, value: Any) -> None:
         """Set value in nested document using dot notation"""
         keys = key.split(".")
@@ -707,53 +995,54 @@ class JSONStorage:
 
     def _group_stage(
         self,
-        docs: List[Dict[str, Any]],
+        docs: Iterable[Dict[str, Any]],
         group_spec: Dict[str, Union[str, Dict[str, Union[str, Dict[str, Any]]]]],
     ) -> List[Dict[str, Any]]:
         """Apply $group aggregation stage"""
         groups: Dict[Any, Dict[str, Any]] = {}
 
         group_key = group_spec.get("_id")
+        key_field = (
+            group_key[1:] if isinstance(group_key, str) and group_key.startswith("$") else None
+        )
+
+        # Resolve the accumulators once instead of re-reading the spec for every document
+        accumulators: List[Tuple[str, str, Any]] = [
+            (field, op_name, op_field)
+            for field, op in group_spec.items()
+            if field != "_id" and isinstance(op, dict)
+            for op_name, op_field in op.items()
+            if op_name in ("$sum", "$push")
+        ]
 
         for doc in docs:
             # Get group key value
-            if isinstance(group_key, str) and group_key.startswith("$"):
-                key_value = self.get_nested_value(doc, group_key[1:])
-            else:
-                key_value = group_key
+            key_value = (
+                self.get_nested_value(doc, key_field) if key_field is not None else group_key
+            )
 
-            if key_value not in groups:
-                groups[key_value] = {"_id": key_value}
+            group = groups.get(key_value)
+            if group is None:
+                group = groups[key_value] = {"_id": key_value}
+                for field, op_name, _ in accumulators:
+                    group[field] = 0 if op_name == "$sum" else []
 
             # Apply accumulator operations
-            for field, op in group_spec.items():
-                if field == "_id":
-                    continue
-
-                if isinstance(op, dict):  # type: ignore
-                    for op_name, op_field in op.items():
-                        if op_name == "$sum":
-                            if field not in groups[key_value]:
-                                groups[key_value][field] = 0
-                            groups[key_value][field] += op_field if isinstance(op_field, int) else 1
-                        elif op_name == "$push":
-                            if field not in groups[key_value]:
-                                groups[key_value][field] = []
-
-                            if isinstance(op_field, dict):
-                                # Push a document
-                                push_doc = {}
-                                for k, v in op_field.items():
-                                    if isinstance(v, str) and v.startswith("$"):
-                                        push_doc[k] = self.get_nested_value(doc, v[1:])
-                                    else:
-                                        push_doc[k] = v
-                                groups[key_value][field].append(push_doc)
-                            elif isinstance(op_field, str) and op_field.startswith("$"):  # type: ignore
-                                # Push a field value
-                                groups[key_value][field].append(
-                                    self.get_nested_value(doc, op_field[1:])
-                                )
+            for field, op_name, op_field in accumulators:
+                if op_name == "$sum":
+                    group[field] += op_field if isinstance(op_field, int) else 1
+                elif isinstance(op_field, dict):
+                    # Push a document
+                    push_doc = {}
+                    for k, v in op_field.items():
+                        if isinstance(v, str) and v.startswith("$"):
+                            push_doc[k] = self.get_nested_value(doc, v[1:])
+                        else:
+                            push_doc[k] = v
+                    group[field].append(push_doc)
+                elif isinstance(op_field, str) and op_field.startswith("$"):
+                    # Push a field value
+                    group[field].append(self.get_nested_value(doc, op_field[1:]))
 
         return list(groups.values())
 
@@ -829,6 +1118,23 @@ class JSONCollection:
 
         return UpdateResult(result["matched_count"], result["modified_count"])
 
+    def insert_one(self, document: Dict[str, Any]):
+        """Insert a single document"""
+        return self.insert_many([document])
+
+    def insert_many(self, documents: List[Dict[str, Any]], ordered: bool = True):
+        """Insert multiple documents in one write (raises DuplicateKeyError for an existing _id)"""
+        for doc in documents:
+            doc.setdefault("_id", str(uuid.uuid4()))
+        self.storage.insert_many(self.collection_name, documents, ordered=ordered)
+
+        class InsertResult:
+            def __init__(self, inserted_ids: List[Any]):
+                self.inserted_ids = inserted_ids
+                self.inserted_id = inserted_ids[0] if inserted_ids else None
+
+        return InsertResult([doc["_id"] for doc in documents])
+
     def delete_one(self, query: Dict[str, Any]):
         """Delete a single document"""
         result = self.storage.delete_one(self.collection_name, query)
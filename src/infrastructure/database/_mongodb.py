@@ -52,7 +52,7 @@ class MongoConnectionPool:
         self._max_idle_time = 600
         self._client_lock: RLock = threading.RLock()
         self._cleanup_task = None
-        self._shutdown = False
+        self._shutdown = threading.Event()
 
         atexit.register(self.close_all_connections)
 
@@ -65,11 +65,10 @@ class MongoConnectionPool:
         """
 
         def cleanup_worker():
-            while not self._shutdown:
+            # Wait on the shutdown event so close_all_connections stops the thread at once
+            while not self._shutdown.wait(self._cleanup_interval):
                 try:
-                    time.sleep(self._cleanup_interval)
-                    if not self._shutdown:
-                        self._cleanup_idle_connections()
+                    self._cleanup_idle_connections()
                 except Exception as e:
                     logger.error(f"Error in cleanup worker: {e}")
 
@@ -152,7 +151,7 @@ class MongoConnectionPool:
 
     def close_all_connections(self):
         """Close all connections - called during shutdown"""
-        self._shutdown = True
+        self._shutdown.set()
         with self._lock:
             if self._client:
                 try:
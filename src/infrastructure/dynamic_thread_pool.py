@@ -53,30 +53,27 @@ class DynamicThreadPool:
     def _worker(self):
         """Worker thread that processes tasks from the queue"""
         while not self.shutdown_flag.is_set():
-            try:
-                # Wait for a task with timeout to allow checking shutdown flag
-                task_item = self.task_queue.get(timeout=1)
-                if task_item is None:  # Poison pill to stop worker
-                    self.task_queue.task_done()
-                    break
-
-                func, args, kwargs, future = task_item
+            # Block until a task arrives; shutdown and scale-down wake idle workers with
+            # a poison pill, so there is no need to wake up periodically to poll the flag
+            task_item = self.task_queue.get()
+            if task_item is None:  # Poison pill to stop worker
+                self.task_queue.task_done()
+                break
 
-                with self.active_tasks_lock:
-                    self.active_tasks += 1
+            func, args, kwargs, future = task_item
 
-                try:
-                    result = func(*args, **kwargs)
-                    future.set_result(result)
-                except Exception as e:
-                    future.set_exception(e)
-                finally:
-                    with self.active_tasks_lock:
-                        self.active_tasks -= 1
-                    self.task_queue.task_done()
+            with self.active_tasks_lock:
+                self.active_tasks += 1
 
-            except queue.Empty:
-                continue
+            try:
+                result = func(*args, **kwargs)
+                future.set_result(result)
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self.active_tasks_lock:
+                    self.active_tasks -= 1
+                self.task_queue.task_done()
 
     def _scale_to(self, target_workers: int):
         """Scale the thread pool to the target number of workers"""
@@ -155,6 +152,13 @@ chunk_executor = DynamicThreadPool(
     max_workers=max(MAX_WORKERS * 2, MAX_WORKERS + 4),  # Extra capacity for nested parallelism
 )
 
+# Executor for blocking file/S3 reads issued from chunk_executor tasks
+# Kept separate so I/O waits never occupy workers that nested CPU work depends on
+io_executor = DynamicThreadPool(
+    min_workers=max(MIN_WORKERS, MAX_WORKERS // 2),
+    max_workers=max(MAX_WORKERS * 2, MAX_WORKERS + 4),
+)
+
 
 def calculate_optimal_workers(cpu_util: float, queue_size: int = 0) -> int:
     """
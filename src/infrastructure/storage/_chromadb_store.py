@@ -9,39 +9,96 @@ This module provides:
 - Cache invalidation strategies
 """
 
+import os
 from pathlib import Path
-from typing import List, Optional, Dict, Any, Set, cast, Literal, Tuple
+from collections import Counter, OrderedDict, defaultdict
+from itertools import compress
+from typing import Iterator, List, Mapping, Optional, Dict, Any, Set, cast, Literal, Tuple
 from datetime import datetime
 from contextlib import contextmanager
+from contextvars import copy_context
+from concurrent.futures import Future
+import logging
 import threading
+import numpy as np
+from numpy.typing import NDArray
 import chromadb
 from chromadb.api.types import EmbeddingFunction, Documents, Embeddings, Embeddable, Where
 from chromadb import Collection, Metadata
+from chromadb.config import Settings as ChromaSettings
 import json
 
+from ...config import Config
 from ..operation_logging import get_operation_user_id
 from ..clients import ModelServerClient
+from ..dynamic_thread_pool import io_executor
+from ..ids import sha256_hex
 from ...log_creator import get_file_logger
 from ._s3_service import get_s3_service
 from ...core.models.core_models import Chunk
 
 logger = get_file_logger()
 
+# Documents per collection read when streaming the chunks of many documents
+DOC_FETCH_SHARD_SIZE = 200
+
+# Queries restricted to at most max(this, 4 * n_results) chunk_ids are scored exactly
+# against the stored vectors instead of running a filtered HNSW search
+EXACT_SEARCH_MIN_CANDIDATES = 64
+
+# (collection, chunk_id) -> (doc_id, chunk_order_index) entries kept for chunk navigation
+CHUNK_POSITION_CACHE_SIZE = 65536
+
+# System fields added to chunk metadata during storage, stripped when rebuilding Chunk objects
+_CHUNK_SYSTEM_FIELDS = frozenset(
+    {
+        "doc_id",
+        "chunk_id",
+        "created_at",
+        "user_id",
+        "chunk_order_index",
+        "chunk_metadata",
+        "kb_id",
+        "text_hash",
+    }
+)
+
 
 class ModelServerEmbeddingFunction(EmbeddingFunction[Embeddable]):
     """Custom embedding function for ChromaDB using ModelServerClient"""
 
-    def __init__(self, model_name: str = "text-embedding-3-small", batch_size: int = 512):
+    def __init__(
+        self,
+        model_name: str = "text-embedding-3-small",
+        batch_size: int = 512,
+        dimensions: Optional[int] = None,
+        max_batch_chars: int = 600_000,
+        query_cache_size: int = 4096,
+    ):
         """
         Initialize embedding function with ModelServerClient.
 
         Args:
             model_name: OpenAI embedding model name (default: text-embedding-3-small)
+            batch_size: Number of texts sent per embedding request (default: 512)
+            dimensions: Optional shortened embedding size (text-embedding-3 models only).
+                Smaller vectors shrink the HNSW index and the bytes scanned per query.
+            max_batch_chars: Upper bound on the total characters sent per embedding request,
+                keeping batches of long chunks under the model server's request size limit
+            query_cache_size: Number of query embeddings kept in the LRU query cache
         """
         super().__init__()
         self.model_client = ModelServerClient(timeout=0)
         self.model_name = model_name
-        self.batch_size = 512
+        self.batch_size = batch_size
+        self.dimensions = dimensions
+        self.max_batch_chars = max_batch_chars
+
+        # LRU cache of query embeddings (normalized query text -> vector). Embeddings are
+        # deterministic, so repeated agent queries skip the model round-trip entirely.
+        self.query_cache_size = query_cache_size
+        self._query_cache: OrderedDict[str, NDArray[np.float32]] = OrderedDict()
+        self._query_cache_lock = threading.Lock()
 
     def __call__(self, input: Embeddable) -> Embeddings:
         """
@@ -56,29 +113,99 @@ class ModelServerEmbeddingFunction(EmbeddingFunction[Embeddable]):
         # Cast to Documents (List[str]) since ModelServerEmbeddingFunction only supports text
         input_texts = cast(Documents, input)
 
-        embeddings: List[List[float]] = []
-        batch_size = 512
+        embeddings: List[NDArray[np.float32]] = []
+        for batch in self._iter_batches(input_texts):
+            embeddings.extend(self._embed_batch(batch))
+        return cast(Embeddings, embeddings)
 
-        for batch_idx in range(0, len(input_texts), batch_size):
-            batch = input_texts[batch_idx : batch_idx + batch_size]
+    def embed_queries(self, queries: List[str]) -> List[NDArray[np.float32]]:
+        """
+        Embed query texts, serving repeated queries from the LRU query cache.
 
-            attempt = 0
-            while True:
-                try:
-                    response = self.model_client.create_openai_embeddings(
-                        batch, model=self.model_name
-                    )
-                    batch_embeddings = response
-                    embeddings.extend(batch_embeddings)
-                    break  # Successfully processed batch, move to next
-                except Exception as e:
-                    logger.error(f"Error in generation embeddigns: {e}")
-                    if "429" in str(e):
-                        attempt += 1
-                        continue
-                    else:
-                        raise
-        return cast(Embeddings, embeddings)
+        Cache misses are embedded together in one call. Queries are keyed on their
+        whitespace-normalized text.
+
+        Args:
+            queries: Query texts to embed
+
+        Returns:
+            One read-only embedding vector per query, in input order
+        """
+        keys = [" ".join(query.split()) for query in queries]
+        vectors: Dict[str, NDArray[np.float32]] = {}
+
+        with self._query_cache_lock:
+            for key in keys:
+                cached = self._query_cache.get(key)
+                if cached is not None:
+                    self._query_cache.move_to_end(key)
+                    vectors[key] = cached
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing:
+            for key, vector in zip(missing, self(missing)):
+                vector.setflags(write=False)
+                vectors[key] = vector
+
+            with self._query_cache_lock:
+                for key in missing:
+                    self._query_cache[key] = vectors[key]
+                    self._query_cache.move_to_end(key)
+                while len(self._query_cache) > self.query_cache_size:
+                    self._query_cache.popitem(last=False)
+
+        return [vectors[key] for key in keys]
+
+    def _iter_batches(self, texts: Documents) -> Iterator[List[str]]:
+        """Yield consecutive batches capped by both text count and total characters."""
+        batch: List[str] = []
+        batch_chars = 0
+        for text in texts:
+            if batch and (
+                len(batch) >= self.batch_size or batch_chars + len(text) > self.max_batch_chars
+            ):
+                yield batch
+                batch = []
+                batch_chars = 0
+            batch.append(text)
+            batch_chars += len(text)
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _is_payload_too_large(error: Exception) -> bool:
+        """Whether an embedding request was rejected for its size (HTTP 413 or "too large")."""
+        response = getattr(error, "response", None)
+        if getattr(response, "status_code", None) == 413:
+            return True
+        message = str(error).lower()
+        return "413" in message or "too large" in message or "maximum context length" in message
+
+    def _embed_batch(self, batch: List[str]) -> NDArray[np.float32]:
+        """
+        Embed one batch, retrying on rate limits. A batch rejected as too large is split in
+        half and retried, so one oversized request degrades to smaller ones instead of
+        failing the whole call. Any other error is raised.
+        """
+        while True:
+            try:
+                response = self.model_client.create_openai_embeddings(
+                    batch, model=self.model_name, dimensions=self.dimensions
+                )
+                # Pack each batch into one contiguous float32 matrix (the precision
+                # ChromaDB indexes at) instead of keeping lists of boxed Python floats
+                return np.asarray(response, dtype=np.float32)
+            except Exception as e:
+                logger.error(f"Error in generation embeddigns: {e}")
+                if "429" in str(e):
+                    continue
+                if len(batch) == 1 or not self._is_payload_too_large(e):
+                    raise
+                mid = len(batch) // 2
+                logger.warning(f"Splitting embedding batch of {len(batch)} texts after error")
+                return np.concatenate(
+                    [self._embed_batch(batch[:mid]), self._embed_batch(batch[mid:])]
+                )
 
 
 class ChromaDBStore:
@@ -96,6 +223,9 @@ class ChromaDBStore:
         mode: str = "development",
         s3_enabled: bool = False,
         model_name: str = "text-embedding-3-small",
+        embedding_dimensions: Optional[int] = None,
+        memory_limit_bytes: Optional[int] = None,
+        hnsw_config: Optional[Dict[str, Any]] = None,
     ):
         """
         Initialize ChromaDB store.
@@ -106,6 +236,12 @@ class ChromaDBStore:
             mode: "development" or "production"
             s3_enabled: Enable S3 backup (production only)
             model_name: Embedding model to use
+            embedding_dimensions: Optional shortened embedding size. Must stay fixed for the
+                lifetime of a persist_dir since existing collections keep their dimension.
+            memory_limit_bytes: Optional cap on memory used by loaded collection indexes.
+                Least recently used collections are evicted once it is exceeded.
+            hnsw_config: Optional HNSW tuning applied to newly created collections, as Chroma
+                metadata keys without the "hnsw:" prefix (e.g. {"M": 32, "search_ef": 64}).
         """
         if chromadb is None:
             raise ImportError("chromadb not installed. Install with: pip install chromadb")
@@ -116,27 +252,52 @@ class ChromaDBStore:
         self.persist_dir = Path(persist_dir)
         self.persist_dir.mkdir(parents=True, exist_ok=True)
         self.index_type = index_type
+        self.hnsw_config = dict(hnsw_config or {})
 
         self.mode = mode
         self.s3_enabled = s3_enabled and mode == "production"
 
         # Create embedding function for loading existing collections
-        self.embedding_function = ModelServerEmbeddingFunction(model_name=model_name)
+        self.embedding_function = ModelServerEmbeddingFunction(
+            model_name=model_name, dimensions=embedding_dimensions
+        )
 
         # Initialize ChromaDB (using new PersistentClient API)
-        self.client = chromadb.PersistentClient(path=str(self.persist_dir))
+        # With a memory limit, loaded collection indexes are kept in an LRU cache and
+        # evicted (to be reloaded from disk on demand) instead of all staying resident
+        client_settings = ChromaSettings()
+        if memory_limit_bytes:
+            client_settings = ChromaSettings(
+                chroma_segment_cache_policy="LRU",
+                chroma_memory_limit_bytes=memory_limit_bytes,
+            )
+        self.client = chromadb.PersistentClient(
+            path=str(self.persist_dir), settings=client_settings
+        )
 
-        # Thread safety
+        # Thread safety: _lock serializes writers (add/delete/transaction); the collection
+        # cache has its own lock so searches never wait behind an in-progress ingest
         self._lock = threading.RLock()
+        self._collection_cache_lock = threading.Lock()
         self._collection_cache: Dict[str, Any] = {}
 
+        # LRU of chunk positions for previous/next/neighbor navigation. A chunk's doc_id and
+        # order index never change while it exists, so entries only go on deletion.
+        self._chunk_positions: OrderedDict[Tuple[str, str], Tuple[str, float]] = OrderedDict()
+        self._chunk_positions_lock = threading.Lock()
+
         logger.info(f"ChromaDBStore initialized ({mode} mode)")
 
     def get_or_create_collection(
         self, name: str, metadata: Optional[Dict[str, Any]] = None
     ) -> Collection:
         """Get or create a collection with ModelServer embeddings and index type configuration."""
-        with self._lock:
+        # Fast path without locking: collection handles are safe to share across threads
+        collection = self._collection_cache.get(name)
+        if collection is not None:
+            return collection
+
+        with self._collection_cache_lock:
             if name in self._collection_cache:
                 return self._collection_cache[name]
 
@@ -152,6 +313,11 @@ class ChromaDBStore:
             # Only add HNSW configuration for HNSW index type
             if self.index_type == "hnsw":
                 collection_metadata["hnsw:space"] = "cosine"
+                # Graph degree / ef trade recall against memory and per-query work.
+                # All KBs of a user share one collection and are separated by kb_id filters,
+                # so these settings apply to the whole per-user index.
+                for key, value in self.hnsw_config.items():
+                    collection_metadata.setdefault(f"hnsw:{key}", value)
 
             collection_kwargs["metadata"] = collection_metadata
 
@@ -166,7 +332,8 @@ class ChromaDBStore:
         self,
         chunk_id: str,
         document: str,
-        metadata: Dict[str, Any],
+        metadata: Mapping[str, Any],
+        user_id: Optional[str] = None,
     ) -> Chunk:
         """
         Build a Chunk object from retrieved data, preserving user_id and created_at.
@@ -175,13 +342,17 @@ class ChromaDBStore:
             chunk_id: The chunk ID
             document: The document text
             doc_id: The document ID
-            metadata: The metadata dict containing user_id and created_at
+            metadata: The metadata dict containing user_id and created_at; only read, so
+                results from ChromaDB are passed as-is without copying
+            user_id: Operation user ID; resolved from the operation context when omitted.
+                Callers building many chunks resolve it once and pass it in.
 
         Returns:
             Chunk object with preserved user_id and created_at
         """
         # Extract user_id and created_at from metadata
-        user_id = get_operation_user_id()
+        if user_id is None:
+            user_id = get_operation_user_id()
         created_at_str = metadata.get("created_at")
 
         # Parse created_at timestamp
@@ -197,17 +368,7 @@ class ChromaDBStore:
             created_at = datetime.now()
 
         # Extract user metadata (exclude system fields added during storage)
-        # System fields: doc_id, chunk_id, created_at, user_id, chunk_order_index, chunk_metadata, kb_id
-        system_fields = {
-            "doc_id",
-            "chunk_id",
-            "created_at",
-            "user_id",
-            "chunk_order_index",
-            "chunk_metadata",
-            "kb_id",
-        }
-        chunk_metadata = {k: v for k, v in metadata.items() if k not in system_fields}
+        chunk_metadata = {k: v for k, v in metadata.items() if k not in _CHUNK_SYSTEM_FIELDS}
 
         return Chunk(
             _id=chunk_id,
@@ -218,6 +379,62 @@ class ChromaDBStore:
             user_id=user_id,
         )
 
+    @staticmethod
+    def _order_index_sort_key(metadata: Dict[str, Any]) -> float:
+        """Return chunk_order_index from metadata as a float sort key (0.0 if missing/invalid)."""
+        chunk_order_index = metadata.get("chunk_order_index")
+        if isinstance(chunk_order_index, (int, float, str)):
+            try:
+                return float(chunk_order_index)
+            except (ValueError, TypeError):
+                return 0.0
+        return 0.0
+
+    def _remember_chunk_position(
+        self, collection_name: str, chunk_id: str, metadata: Mapping[str, Any]
+    ) -> Tuple[str, float]:
+        """Cache and return a chunk's (doc_id, chunk_order_index) from its stored metadata."""
+        position = (str(metadata.get("doc_id") or ""), self._order_index_sort_key(metadata))
+        with self._chunk_positions_lock:
+            self._chunk_positions[(collection_name, chunk_id)] = position
+            self._chunk_positions.move_to_end((collection_name, chunk_id))
+            if len(self._chunk_positions) > CHUNK_POSITION_CACHE_SIZE:
+                self._chunk_positions.popitem(last=False)
+        return position
+
+    def _get_chunk_position(
+        self, collection: Collection, collection_name: str, chunk_id: str
+    ) -> Optional[Tuple[str, float]]:
+        """
+        Get a chunk's (doc_id, chunk_order_index), reading its metadata only on a cache miss.
+
+        Returns:
+            The chunk's position (doc_id may be empty), or None if the chunk does not exist
+        """
+        with self._chunk_positions_lock:
+            position = self._chunk_positions.get((collection_name, chunk_id))
+            if position is not None:
+                self._chunk_positions.move_to_end((collection_name, chunk_id))
+                return position
+
+        current = collection.get(ids=[chunk_id], include=["metadatas"])  # type: ignore
+        if not current or not current.get("ids"):
+            return None
+        metadata: Mapping[str, Any] = (current.get("metadatas") or [{}])[0] or {}
+        return self._remember_chunk_position(collection_name, chunk_id, metadata)
+
+    def _forget_chunk_positions(
+        self, collection_name: str, chunk_ids: Optional[List[str]] = None
+    ) -> None:
+        """Drop cached positions of deleted chunks, or of the whole collection if chunk_ids=None."""
+        with self._chunk_positions_lock:
+            if chunk_ids is None:
+                stale = [key for key in self._chunk_positions if key[0] == collection_name]
+            else:
+                stale = [(collection_name, chunk_id) for chunk_id in chunk_ids]
+            for key in stale:
+                self._chunk_positions.pop(key, None)
+
     def check_duplicate_chunks(
         self,
         collection_name: str,
@@ -252,7 +469,7 @@ class ChromaDBStore:
 
             # Check for ID duplicates
             if chunk_ids:
-                existing = collection.get(ids=chunk_ids)
+                existing = collection.get(ids=chunk_ids, include=[])
                 id_duplicates = existing.get("ids", [])
                 if id_duplicates:
                     result["id_duplicates"] = id_duplicates
@@ -286,6 +503,52 @@ class ChromaDBStore:
 
         return result
 
+    def _embed_reusing_stored(
+        self, collection: Collection, texts: List[str], text_hashes: List[str]
+    ) -> List[Any]:
+        """
+        Embed chunk texts, reusing the stored vector of any chunk with identical text.
+
+        Re-ingested or repeated content (boilerplate, headers, new versions of a document)
+        is matched by content hash against the collection, and each remaining distinct
+        text is embedded once.
+
+        Args:
+            collection: Collection the chunks are added to
+            texts: Chunk texts to embed
+            text_hashes: SHA-256 of each text, aligned with texts
+
+        Returns:
+            One embedding vector per text, in input order
+        """
+        vectors: Dict[str, Any] = {}
+        try:
+            stored = collection.get(
+                where=cast(Where, {"text_hash": {"$in": list(dict.fromkeys(text_hashes))}}),
+                include=["metadatas", "embeddings"],  # type: ignore
+            )
+            stored_embeddings = stored.get("embeddings")
+            if stored_embeddings is not None:
+                for metadata, embedding in zip(stored.get("metadatas") or [], stored_embeddings):
+                    if metadata:
+                        vectors.setdefault(str(metadata.get("text_hash")), embedding)
+        except Exception as e:
+            logger.warning(f"Failed to look up stored embeddings, embedding all texts: {e}")
+            vectors = {}
+
+        # One embedding call for every distinct text without a stored vector
+        missing: Dict[str, str] = {}
+        for text_hash, text in zip(text_hashes, texts):
+            if text_hash not in vectors:
+                missing.setdefault(text_hash, text)
+        if missing:
+            vectors.update(zip(missing, self.embedding_function(list(missing.values()))))
+
+        if len(missing) < len(texts):
+            logger.info(f"Embedded {len(missing)} distinct new texts for {len(texts)} chunks")
+
+        return [vectors[text_hash] for text_hash in text_hashes]
+
     @staticmethod
     def _sanitize_metadata_value(value: Any, key: str = "unknown") -> Any:
         """
@@ -356,6 +619,7 @@ class ChromaDBStore:
         collection_name: str,
         chunks: List[Chunk],
         skip_duplicates: bool = True,
+        embeddings: Optional[List[List[float]]] = None,
     ) -> List[str]:
         """
         Add chunks to collection with structured metadata and duplicate detection.
@@ -364,6 +628,8 @@ class ChromaDBStore:
             collection_name: Target collection
             chunks: List of Chunk objects with chunk_id, doc_id, content, metadata, created_at
             skip_duplicates: If True, skip chunks with existing IDs; if False, replace them
+            embeddings: Optional precomputed vectors aligned with chunks. When provided the
+                collection's embedding function is bypassed entirely.
 
         Returns:
             List of actually added chunk IDs (excluding duplicates if skip_duplicates=True)
@@ -373,6 +639,11 @@ class ChromaDBStore:
             logger.info(f"No chunks to add to '{collection_name}'")
             return []
 
+        if embeddings is not None and len(embeddings) != len(chunks):
+            raise ValueError(
+                f"Got {len(embeddings)} embeddings for {len(chunks)} chunks in '{collection_name}'"
+            )
+
         with self._lock:
             collection = self.get_or_create_collection(collection_name)
 
@@ -383,21 +654,27 @@ class ChromaDBStore:
             # ================================================================
             if chunk_ids:
                 try:
-                    existing_result = collection.get(ids=chunk_ids)
-                    existing_ids: Set[str] = set(existing_result.get("ids", []))
+                    # Only ids are needed here, skip loading documents and metadata
+                    existing_result = collection.get(ids=chunk_ids, include=[])
+                    existing_id_list: List[str] = existing_result.get("ids", [])
                 except Exception as e:
                     logger.warning(f"Failed to check for existing chunks: {e}")
-                    existing_ids = set()
+                    existing_id_list = []
+                existing_ids: Set[str] = set(existing_id_list)
 
                 if existing_ids:
                     if skip_duplicates:
-                        # Filter out duplicates
+                        # Filter out duplicates (logged in lookup order, no sort needed)
                         logger.warning(
                             f"Found {len(existing_ids)} duplicate chunk IDs in '{collection_name}': "
-                            f"{sorted(existing_ids)[:10]}{'...' if len(existing_ids) > 10 else ''}"
+                            f"{existing_id_list[:10]}{'...' if len(existing_ids) > 10 else ''}"
                         )
-                        chunks = [c for c in chunks if c.chunk_id not in existing_ids]
-                        chunk_ids = [c.chunk_id for c in chunks]
+                        # One membership pass, reused for chunks, ids and embeddings
+                        keep = [chunk_id not in existing_ids for chunk_id in chunk_ids]
+                        if embeddings is not None:
+                            embeddings = list(compress(embeddings, keep))
+                        chunks = list(compress(chunks, keep))
+                        chunk_ids = list(compress(chunk_ids, keep))
 
                         if not chunks:
                             logger.info("All chunks are duplicates, skipping add")
@@ -408,11 +685,18 @@ class ChromaDBStore:
                             f"Will replace {len(existing_ids)} duplicate chunks in '{collection_name}'"
                         )
 
+            # Probe the log level once: the per-chunk/per-key diagnostics below build
+            # f-strings for every metadata value and are skipped entirely unless DEBUG is on
+            debug_enabled = logger.isEnabledFor(logging.DEBUG)
+
             # Extract text content from chunks for embedding
             # Content can be a dict with text field or a simple string representation
             texts: List[str] = []
             for chunk in chunks:
-                logger.debug(f"Chunk {chunk.chunk_id} content type: {type(chunk.content).__name__}")
+                if debug_enabled:
+                    logger.debug(
+                        f"Chunk {chunk.chunk_id} content type: {type(chunk.content).__name__}"
+                    )
                 try:
                     text = json.dumps(chunk.content, indent=1)
                 except TypeError as json_error:
@@ -421,10 +705,12 @@ class ChromaDBStore:
                     )
                     text = str(chunk.content)
                 texts.append(text)
+            # Hash of the embedded text, used to reuse vectors of identical chunks
+            text_hashes = [sha256_hex(text) for text in texts]
 
             # Build metadata for each chunk, preserving kb_id and other metadata
             metadatas: List[Metadata] = []
-            for chunk in chunks:
+            for chunk, text_hash in zip(chunks, text_hashes):
                 # Safely extract chunk_order_index, ensuring it's an integer
                 chunk_order_index = (
                     chunk.content.get("chunk_order_index", 0) if chunk.content else 0
@@ -436,19 +722,20 @@ class ChromaDBStore:
                     )
                     chunk_order_index = 0
 
-                # Debug: Log incoming metadata from chunk before processing
-                logger.debug(
-                    f"Chunk {chunk.chunk_id} incoming metadata types: {[(k, type(v).__name__) for k, v in chunk.metadata.items()]}"
-                )
+                if debug_enabled:
+                    # Debug: Log incoming metadata from chunk before processing
+                    logger.debug(
+                        f"Chunk {chunk.chunk_id} incoming metadata types: {[(k, type(v).__name__) for k, v in chunk.metadata.items()]}"
+                    )
+                    logger.debug(
+                        f"Chunk {chunk.chunk_id} initial values - "
+                        f"doc_id type: {type(chunk.doc_id).__name__}, "
+                        f"chunk_id type: {type(chunk.chunk_id).__name__}, "
+                        f"user_id type: {type(chunk.user_id).__name__}, "
+                        f"chunk_order_index type: {type(chunk_order_index).__name__}"
+                    )
 
                 # Sanitize initial metadata values
-                logger.debug(
-                    f"Chunk {chunk.chunk_id} initial values - "
-                    f"doc_id type: {type(chunk.doc_id).__name__}, "
-                    f"chunk_id type: {type(chunk.chunk_id).__name__}, "
-                    f"user_id type: {type(chunk.user_id).__name__}, "
-                    f"chunk_order_index type: {type(chunk_order_index).__name__}"
-                )
                 chunk_metadata: Dict[str, Any] = {
                     "doc_id": self._sanitize_metadata_value(chunk.doc_id, "doc_id") or "unknown",
                     "chunk_id": self._sanitize_metadata_value(chunk.chunk_id, "chunk_id")
@@ -457,18 +744,20 @@ class ChromaDBStore:
                         chunk_order_index, "chunk_order_index"
                     )
                     or 0,
+                    "text_hash": text_hash,
                 }
                 # Only add user_id if it's not None (ChromaDB doesn't accept None values)
                 user_id_sanitized = self._sanitize_metadata_value(chunk.user_id, "user_id")
                 if user_id_sanitized is not None:
                     chunk_metadata["user_id"] = user_id_sanitized
-                logger.debug(
-                    f"Chunk {chunk.chunk_id} sanitized metadata initial dict - "
-                    f"doc_id: {type(chunk_metadata['doc_id']).__name__}, "
-                    f"chunk_id: {type(chunk_metadata['chunk_id']).__name__}, "
-                    f"user_id: {type(chunk_metadata.get('user_id')).__name__}, "
-                    f"chunk_order_index: {type(chunk_metadata['chunk_order_index']).__name__}"
-                )
+                if debug_enabled:
+                    logger.debug(
+                        f"Chunk {chunk.chunk_id} sanitized metadata initial dict - "
+                        f"doc_id: {type(chunk_metadata['doc_id']).__name__}, "
+                        f"chunk_id: {type(chunk_metadata['chunk_id']).__name__}, "
+                        f"user_id: {type(chunk_metadata.get('user_id')).__name__}, "
+                        f"chunk_order_index: {type(chunk_metadata['chunk_order_index']).__name__}"
+                    )
                 # Flatten and sanitize chunk.metadata
                 for key, value in chunk.metadata.items():
                     try:
@@ -485,7 +774,12 @@ class ChromaDBStore:
 
             # Final safety check: Clean and validate all metadata before adding to ChromaDB
             cleaned_metadatas: List[Metadata] = []
-            for _, metadata in enumerate(metadatas):
+            for metadata in metadatas:
+                # Sanitized metadata is normally all scalars already: keep that dict as-is
+                # and only rebuild the ones still holding None, lists or other values
+                if all(isinstance(value, (str, int, float, bool)) for value in metadata.values()):
+                    cleaned_metadatas.append(metadata)
+                    continue
                 cleaned_metadata: Dict[str, Any] = {}
                 for key, value in metadata.items():
                     # Skip None values - ChromaDB doesn't accept them
@@ -518,34 +812,73 @@ class ChromaDBStore:
                         cleaned_metadata[key] = str(value)
                 cleaned_metadatas.append(cleaned_metadata)
 
-            # Debug: Log every metadata value right before add
-            logger.debug(f"Total chunks to add: {len(chunk_ids)}")
-            for chunk_idx, (chunk_id, metadata) in enumerate(zip(chunk_ids, cleaned_metadatas)):
-                logger.debug(
-                    f"Chunk {chunk_idx}: ID={chunk_id}, metadata_keys={list(metadata.keys())}"
-                )
-                for key, value in metadata.items():
-                    actual_type = type(value).__name__
-                    logger.debug(f"  {key}: {actual_type} = {repr(value)[:80]}")
-                    if not isinstance(value, (str, int, float, bool, type(None), list)):
-                        logger.error(
-                            f"FAILED: Chunk {chunk_id} key '{key}' is {actual_type}: {repr(value)[:100]}"
-                        )
-                    elif isinstance(value, list):
-                        for item_idx, item in enumerate(value):
-                            if not isinstance(item, (str, int, float, bool, type(None))):  # type: ignore
-                                logger.error(
-                                    f"FAILED: List item {chunk_id}[{key}][{item_idx}] is {type(item).__name__}"
-                                )
+            # Debug: Log every metadata value right before add. The cleanup pass above
+            # already guarantees primitive values, so this is purely diagnostic.
+            if debug_enabled:
+                logger.debug(f"Total chunks to add: {len(chunk_ids)}")
+                for chunk_idx, (chunk_id, metadata) in enumerate(
+                    zip(chunk_ids, cleaned_metadatas)
+                ):
+                    logger.debug(
+                        f"Chunk {chunk_idx}: ID={chunk_id}, metadata_keys={list(metadata.keys())}"
+                    )
+                    for key, value in metadata.items():
+                        actual_type = type(value).__name__
+                        logger.debug(f"  {key}: {actual_type} = {repr(value)[:80]}")
+                        if not isinstance(value, (str, int, float, bool, type(None), list)):
+                            logger.error(
+                                f"FAILED: Chunk {chunk_id} key '{key}' is {actual_type}: {repr(value)[:100]}"
+                            )
+                        elif isinstance(value, list):
+                            for item_idx, item in enumerate(value):
+                                if not isinstance(item, (str, int, float, bool, type(None))):  # type: ignore
+                                    logger.error(
+                                        f"FAILED: List item {chunk_id}[{key}][{item_idx}] is {type(item).__name__}"
+                                    )
+
+            if embeddings is None:
+                embeddings = self._embed_reusing_stored(collection, texts, text_hashes)
 
             logger.info(
                 f"About to add {len(chunk_ids)} chunks to ChromaDB collection '{collection_name}'"
             )
-            collection.add(
-                ids=chunk_ids,
-                documents=texts,
-                metadatas=cleaned_metadatas,
-            )
+            # Texts are embedded up front (in batch_size requests, skipping texts whose
+            # vectors are already stored); precomputed vectors are used as given.
+            # Write in slices of the client's maximum batch size: Chroma rejects larger
+            # adds, and each slice's records are built and written on their own.
+            max_batch_size = self.client.get_max_batch_size()
+            attempted = 0
+            try:
+                for start in range(0, len(chunk_ids), max_batch_size):
+                    end = start + max_batch_size
+                    attempted = end
+                    collection.add(
+                        ids=chunk_ids[start:end],
+                        documents=texts[start:end],
+                        metadatas=cleaned_metadatas[start:end],
+                        embeddings=(
+                            cast(Embeddings, embeddings[start:end])
+                            if embeddings is not None
+                            else None
+                        ),
+                    )
+            except Exception:
+                # Undo the slices written by this call. Chunks that were already stored
+                # before it are never deleted.
+                written_ids = [
+                    chunk_id for chunk_id in chunk_ids[:attempted] if chunk_id not in existing_ids
+                ]
+                if written_ids:
+                    try:
+                        collection.delete(ids=written_ids)
+                        logger.info(
+                            f"Rolled back {len(written_ids)} chunks from '{collection_name}'"
+                        )
+                    except Exception as rollback_error:
+                        logger.error(
+                            f"Failed to roll back chunks in '{collection_name}': {rollback_error}"
+                        )
+                raise
 
             logger.info(
                 f"Successfully added {len(chunks)} chunks to '{collection_name}' "
@@ -582,6 +915,54 @@ class ChromaDBStore:
         Returns:
             List of tuples (Chunk, distance) where distance is the similarity score
         """
+        results = self.query_batch(
+            collection_name,
+            query_texts,
+            n_results=n_results,
+            where=where,
+            doc_ids=doc_ids,
+            kb_ids=kb_ids,
+            chunk_ids=chunk_ids,
+            min_chunk_order_index=min_chunk_order_index,
+            max_chunk_order_index=max_chunk_order_index,
+        )
+        return results[0] if results else []
+
+    def query_batch(
+        self,
+        collection_name: str,
+        query_texts: List[str],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        doc_ids: Optional[List[str]] = None,
+        kb_ids: Optional[List[str]] = None,
+        chunk_ids: Optional[List[str]] = None,
+        min_chunk_order_index: Optional[float] = None,
+        max_chunk_order_index: Optional[float] = None,
+    ) -> List[List[Tuple[Chunk, float]]]:
+        """
+        Run several queries against a collection in a single call.
+
+        All query texts are embedded in one embedding request and searched together
+        by ChromaDB, instead of one embed + search round-trip per query.
+
+        Args:
+            collection_name: Source collection
+            query_texts: Query texts to search
+            n_results: Number of results to return per query
+            where: Optional custom metadata filter (merged with other conditions)
+            doc_ids: Optional list of document IDs to filter by
+            kb_ids: Optional list of knowledge base IDs to filter by
+            chunk_ids: Optional list of chunk IDs to filter by
+            min_chunk_order_index: Optional minimum chunk order index (inclusive)
+            max_chunk_order_index: Optional maximum chunk order index (inclusive)
+
+        Returns:
+            One list of (Chunk, distance) tuples per query text, in input order
+        """
+        if not query_texts:
+            return []
+
         collection = self.get_or_create_collection(collection_name)
 
         # Build filter conditions from chunk-specific parameters
@@ -620,41 +1001,123 @@ class ChromaDBStore:
         # Use filter if any conditions exist
         final_where = filter_conditions if filter_conditions else None
 
-        results = collection.query(
-            query_texts=query_texts,
-            n_results=n_results,
-            where=final_where,
+        # Query vectors come from the embedding function's LRU cache so repeated
+        # queries are not re-embedded on every search
+        query_embeddings = self.embedding_function.embed_queries(query_texts)
+        results = None
+        if chunk_ids and len(chunk_ids) <= max(EXACT_SEARCH_MIN_CANDIDATES, 4 * n_results):
+            # The chunk_ids bound the candidate set, so scoring them directly costs one
+            # read instead of a filtered graph search
+            results = self._exact_query(
+                collection,
+                query_embeddings,
+                n_results,
+                chunk_ids,
+                cast(Dict[str, Any], final_where),
+            )
+        if results is None:
+            results = collection.query(
+                query_embeddings=cast(Embeddings, query_embeddings),
+                n_results=n_results,
+                where=final_where,
+            )
+
+        # Convert query results to one List[Tuple[Chunk, float]] per query
+        batched: List[List[Tuple[Chunk, float]]] = []
+        if results and results.get("ids"):
+            all_documents = results.get("documents") or []
+            all_metadatas = results.get("metadatas") or []
+            all_distances = results.get("distances") or []
+
+            user_id = get_operation_user_id()
+            for query_idx, result_ids in enumerate(results["ids"]):
+                result_documents = all_documents[query_idx] if all_documents else []
+                result_metadatas = all_metadatas[query_idx] if all_metadatas else []
+                result_distances = (
+                    all_distances[query_idx] if all_distances else [0.0] * len(result_ids)
+                )
+
+                chunks: List[Tuple[Chunk, float]] = []
+                for chunk_id, document, metadata, distance in zip(
+                    result_ids, result_documents, result_metadatas, result_distances
+                ):
+                    chunk = self._build_chunk_from_retrieval(
+                        chunk_id=chunk_id,
+                        document=document,
+                        metadata=metadata,
+                        user_id=user_id,
+                    )
+                    chunks.append((chunk, distance))
+                batched.append(chunks)
+
+        logger.debug(
+            f"Batched query on '{collection_name}' ran {len(query_texts)} queries, "
+            f"returned {sum(len(chunks) for chunks in batched)} results"
         )
+        return batched
 
-        # Convert query results to List[Tuple[Chunk, float]]
-        chunks: List[Tuple[Chunk, float]] = []
-        if results and results.get("ids") and len(results["ids"]) > 0:
-            result_ids = results["ids"][0]
-            if results["documents"]:
-                result_documents = results["documents"][0]
-            else:
-                result_documents = []
-            if results["metadatas"]:
-                result_metadatas = results["metadatas"][0]
-            else:
-                result_metadatas = []
-            if results["distances"]:
-                result_distances = results["distances"][0]
-            else:
-                result_distances = [0.0] * len(result_ids)
+    def _exact_query(
+        self,
+        collection: Collection,
+        query_embeddings: List[NDArray[np.float32]],
+        n_results: int,
+        chunk_ids: List[str],
+        where: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """
+        Score a few candidate chunks exactly instead of searching the HNSW index.
 
-            for chunk_id, document, metadata, distance in zip(
-                result_ids, result_documents, result_metadatas, result_distances
-            ):
-                chunk = self._build_chunk_from_retrieval(
-                    chunk_id=chunk_id,
-                    document=document,
-                    metadata=dict(metadata),
-                )
-                chunks.append((chunk, distance))
+        Comparing the queries against the candidates' stored vectors is cheaper than a
+        filtered graph search and always returns every match.
 
-        logger.debug(f"Query on '{collection_name}' returned {len(chunks)} results")
-        return chunks
+        Args:
+            collection: Collection to read the candidates from
+            query_embeddings: One vector per query
+            n_results: Number of results to return per query
+            chunk_ids: Candidate chunk IDs (looked up by primary key)
+            where: Full filter the candidates must also satisfy
+
+        Returns:
+            Results shaped like Collection.query output
+        """
+        candidates = collection.get(
+            ids=chunk_ids,
+            where=cast(Where, where),
+            include=["embeddings", "documents", "metadatas"],  # type: ignore
+        )
+        ids = candidates.get("ids", []) if candidates else []
+        if not ids:
+            return {"ids": [[] for _ in query_embeddings]}
+
+        documents = candidates.get("documents") or []
+        metadatas = candidates.get("metadatas") or []
+        vectors = np.asarray(candidates["embeddings"], dtype=np.float32)
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+
+        # Same distance definitions as the collection's HNSW space
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        if space == "cosine":
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+            distances = 1.0 - queries @ vectors.T
+        elif space == "ip":
+            distances = 1.0 - queries @ vectors.T
+        else:
+            distances = (
+                (queries**2).sum(axis=1)[:, None]
+                - 2.0 * queries @ vectors.T
+                + (vectors**2).sum(axis=1)[None, :]
+            )
+
+        top_rows = np.argsort(distances, axis=1, kind="stable")[:, :n_results]
+        return {
+            "ids": [[ids[row] for row in rows] for rows in top_rows],
+            "documents": [[documents[row] for row in rows] for rows in top_rows],
+            "metadatas": [[metadatas[row] for row in rows] for rows in top_rows],
+            "distances": [
+                distances[query_idx, rows].tolist() for query_idx, rows in enumerate(top_rows)
+            ],
+        }
 
     def delete_chunks(
         self,
@@ -712,14 +1175,21 @@ class ChromaDBStore:
                 return 0
 
             try:
-                # First, query to get the chunk IDs to delete (for logging)
-                results = collection.get(where=cast(Where, final_where))
+                if chunk_ids and not (doc_ids or kb_ids or where):
+                    # Chunk IDs are the collection's primary keys: resolve them directly
+                    # instead of scanning chunk_id metadata
+                    results = collection.get(ids=chunk_ids, include=[])
+                else:
+                    # First, query to get the chunk IDs to delete (for logging); ids only
+                    results = collection.get(where=cast(Where, final_where), include=[])
                 deleted_ids = results.get("ids", []) if results else []
                 deleted_count = len(deleted_ids)
 
-                # Perform deletion
+                # Perform deletion by the ids just resolved, so the metadata filter
+                # is evaluated once rather than again by the delete
                 if deleted_count > 0:
-                    collection.delete(where=cast(Where, final_where))
+                    collection.delete(ids=deleted_ids)
+                    self._forget_chunk_positions(collection_name, deleted_ids)
                     logger.info(f"Deleted {deleted_count} chunks from '{collection_name}'")
                 else:
                     logger.debug(f"No chunks matched deletion criteria in '{collection_name}'")
@@ -751,31 +1221,17 @@ class ChromaDBStore:
         try:
             collection = self.get_or_create_collection(collection_name)
 
-            # Get the current chunk to find its doc_id and chunk_order_index
-            current = collection.get(ids=[chunk_id])
-            if not current or not current.get("ids"):
+            # Get the current chunk's doc_id and chunk_order_index
+            position = self._get_chunk_position(collection, collection_name, chunk_id)
+            if position is None:
                 logger.warning(f"Chunk '{chunk_id}' not found in '{collection_name}'")
                 return None
-            if current["metadatas"] and len(current["metadatas"]) > 0:
-                current_metadatas: Metadata = current["metadatas"][0]
-            else:
-                current_metadatas = {}
-            doc_id = current_metadatas.get("doc_id", "")
-            order_index_value = current_metadatas.get("chunk_order_index", 0)
+            doc_id, current_order_index = position
 
             if not doc_id:
                 logger.warning(f"Chunk '{chunk_id}' has no doc_id in metadata")
                 return None
 
-            # Convert to float for comparison
-            try:
-                if isinstance(order_index_value, (int, float, str)):
-                    current_order_index = float(order_index_value)
-                else:
-                    current_order_index = 0.0
-            except (ValueError, TypeError):
-                current_order_index = 0.0
-
             # If current chunk is first (index 0 or less), no previous chunk
             if current_order_index <= 0:
                 return None
@@ -809,11 +1265,13 @@ class ChromaDBStore:
                 document = ""
             prev_chunk_id = prev_chunks.get("ids", [""])[0]
 
+            # Remember it so walking further back skips the position lookup
+            self._remember_chunk_position(collection_name, prev_chunk_id, metadata)
             logger.debug(f"Previous chunk for '{chunk_id}': {prev_chunk_id}")
             return self._build_chunk_from_retrieval(
                 chunk_id=prev_chunk_id,
                 document=document,
-                metadata=dict(metadata),
+                metadata=metadata,
             )
 
         except Exception as e:
@@ -841,27 +1299,12 @@ class ChromaDBStore:
         try:
             collection = self.get_or_create_collection(collection_name)
 
-            # Get the current chunk to find its doc_id and chunk_order_index
-            current = collection.get(ids=[chunk_id])
-            if not current or not current.get("ids"):
+            # Get the current chunk's doc_id and chunk_order_index
+            position = self._get_chunk_position(collection, collection_name, chunk_id)
+            if position is None:
                 logger.warning(f"Chunk '{chunk_id}' not found in '{collection_name}'")
                 return None
-
-            if current["metadatas"]:
-                current_metadatas: Metadata = current["metadatas"][0]
-            else:
-                current_metadatas = {}
-            doc_id = current_metadatas.get("doc_id")
-
-            # Convert to float for comparison
-            try:
-                order_index_value = dict(current_metadatas).get("chunk_order_index", 0)
-                if isinstance(order_index_value, (int, float, str)):
-                    current_order_index = float(order_index_value)
-                else:
-                    current_order_index = 0.0
-            except (ValueError, TypeError):
-                current_order_index = 0.0
+            doc_id, current_order_index = position
 
             if not doc_id:
                 logger.warning(f"Chunk '{chunk_id}' has no doc_id in metadata")
@@ -896,11 +1339,13 @@ class ChromaDBStore:
                 document = ""
             next_chunk_id = next_chunks.get("ids", [""])[0]
 
+            # Remember it so walking further forward skips the position lookup
+            self._remember_chunk_position(collection_name, next_chunk_id, metadata)
             logger.debug(f"Next chunk for '{chunk_id}': {next_chunk_id}")
             return self._build_chunk_from_retrieval(
                 chunk_id=next_chunk_id,
                 document=document,
-                metadata=dict(metadata),
+                metadata=metadata,
             )
 
         except Exception as e:
@@ -939,10 +1384,11 @@ class ChromaDBStore:
             else:
                 document = ""
 
+            self._remember_chunk_position(collection_name, result["ids"][0], metadata)
             return self._build_chunk_from_retrieval(
                 chunk_id=result["ids"][0],
                 document=document,
-                metadata=dict(metadata),
+                metadata=metadata,
             )
         except Exception as e:
             logger.error(f"Failed to get chunk '{chunk_id}': {e}")
@@ -974,46 +1420,24 @@ class ChromaDBStore:
                 logger.debug(f"No chunks found for doc_id '{doc_id}'")
                 return []
 
-            # Build chunk list with timestamps
-            chunk_list: List[Dict[str, Any]] = []
             ids = result.get("ids", [])
             metadatas = cast(List[Dict[str, Any]], result.get("metadatas", []))
             documents = cast(List[str], result.get("documents", []))
 
-            for chunk_id, metadata, document in zip(ids, metadatas, documents):
-                # Try to get chunk_order_index, default to 0
-                chunk_order_index = metadata.get("chunk_order_index")
-                if chunk_order_index is None:
-                    sort_key = 0.0
-                elif isinstance(chunk_order_index, (int, float, str)):
-                    try:
-                        sort_key = float(chunk_order_index)
-                    except (ValueError, TypeError):
-                        sort_key = 0.0
-                else:
-                    sort_key = 0.0
-
-                chunk_list.append(
-                    {
-                        "chunk_id": chunk_id,
-                        "document": document,
-                        "metadata": metadata,
-                        "sort_key": sort_key,
-                        "doc_id": doc_id,
-                    }
-                )
-
-            # Sort by chunk_order_index
-            chunk_list.sort(key=lambda x: x["sort_key"])
-
-            # Convert to Chunk objects
+            # Sort row positions by chunk_order_index and build Chunks in a single pass,
+            # without an intermediate per-chunk dict
+            order = sorted(
+                range(len(ids)), key=lambda row: self._order_index_sort_key(metadatas[row])
+            )
+            user_id = get_operation_user_id()
             result_list: List[Chunk] = [
                 self._build_chunk_from_retrieval(
-                    chunk_id=c["chunk_id"],
-                    document=c["document"],
-                    metadata=c["metadata"],
+                    chunk_id=ids[row],
+                    document=documents[row],
+                    metadata=metadatas[row],
+                    user_id=user_id,
                 )
-                for c in chunk_list
+                for row in order
             ]
 
             logger.debug(f"Got {len(result_list)} chunks for doc_id '{doc_id}'")
@@ -1023,6 +1447,161 @@ class ChromaDBStore:
             logger.error(f"Failed to get document chunks for '{doc_id}': {e}")
             return []
 
+    def count_document_chunks(self, collection_name: str, doc_id: str) -> int:
+        """
+        Count the chunks of a document without loading their documents or metadata.
+
+        Args:
+            collection_name: Target collection
+            doc_id: Document ID
+
+        Returns:
+            Number of chunks stored for the document
+        """
+        try:
+            collection = self.get_or_create_collection(collection_name)
+            result = collection.get(where=cast(Where, {"doc_id": doc_id}), include=[])
+            return len(result.get("ids", [])) if result else 0
+        except Exception as e:
+            logger.error(f"Failed to count chunks for '{doc_id}': {e}")
+            return 0
+
+    def count_chunks_by_document(
+        self, collection_name: str, doc_ids: List[str]
+    ) -> Dict[str, int]:
+        """
+        Count chunks for several documents with one metadata-only read.
+
+        Only the doc_id field of each chunk is used; chunk documents are never loaded.
+
+        Args:
+            collection_name: Target collection
+            doc_ids: Document IDs to count
+
+        Returns:
+            Dict mapping each requested doc_id to its chunk count (0 if none)
+        """
+        counts: Dict[str, int] = dict.fromkeys(doc_ids, 0)
+        if not doc_ids:
+            return counts
+
+        try:
+            collection = self.get_or_create_collection(collection_name)
+            where = {"doc_id": doc_ids[0]} if len(doc_ids) == 1 else {"doc_id": {"$in": doc_ids}}
+            result = collection.get(where=cast(Where, where), include=["metadatas"])
+            metadatas = cast(List[Dict[str, Any]], result.get("metadatas") or []) if result else []
+            counts.update(Counter(str(metadata.get("doc_id", "")) for metadata in metadatas))
+            return {doc_id: counts[doc_id] for doc_id in doc_ids}
+
+        except Exception as e:
+            logger.error(f"Failed to count chunks in '{collection_name}': {e}")
+            return counts
+
+    def get_indexed_doc_ids(self, collection_name: str, doc_ids: List[str]) -> List[str]:
+        """
+        Return the subset of doc_ids that have at least one chunk in the collection.
+
+        Only chunk metadata is read, so this stays cheap for large knowledge bases.
+
+        Args:
+            collection_name: Target collection
+            doc_ids: Candidate document IDs
+
+        Returns:
+            Document IDs with stored chunks, in the order given
+        """
+        if not doc_ids:
+            return []
+
+        try:
+            collection = self.get_or_create_collection(collection_name)
+            where = {"doc_id": doc_ids[0]} if len(doc_ids) == 1 else {"doc_id": {"$in": doc_ids}}
+            result = collection.get(where=cast(Where, where), include=["metadatas"])
+            metadatas = cast(List[Dict[str, Any]], result.get("metadatas") or []) if result else []
+            present = {metadata.get("doc_id") for metadata in metadatas}
+            return [doc_id for doc_id in dict.fromkeys(doc_ids) if doc_id in present]
+
+        except Exception as e:
+            logger.error(f"Failed to get indexed doc ids from '{collection_name}': {e}")
+            return []
+
+    def iter_chunks_for_documents(
+        self,
+        collection_name: str,
+        doc_ids: List[str],
+    ) -> Iterator[Tuple[str, List[Chunk]]]:
+        """
+        Stream the chunks of several documents, one shard of documents per collection read.
+
+        Shards are read on the calling thread and only the current shard's chunks are held
+        in memory.
+
+        Args:
+            collection_name: Target collection
+            doc_ids: Document IDs to fetch
+
+        Yields:
+            (doc_id, chunks ordered by chunk_order_index) in doc_ids order.
+            Documents without chunks are skipped.
+        """
+        for start in range(0, len(doc_ids), DOC_FETCH_SHARD_SIZE):
+            shard_doc_ids = doc_ids[start : start + DOC_FETCH_SHARD_SIZE]
+            chunks_by_doc = self._fetch_chunks_for_documents(collection_name, shard_doc_ids)
+            for doc_id in shard_doc_ids:
+                chunks = chunks_by_doc.get(doc_id)
+                if chunks:
+                    yield doc_id, chunks
+
+    def _fetch_chunks_for_documents(
+        self,
+        collection_name: str,
+        doc_ids: List[str],
+    ) -> Dict[str, List[Chunk]]:
+        """Fetch and group the chunks of one shard of documents (see iter_chunks_for_documents)."""
+        if not doc_ids:
+            return {}
+
+        try:
+            collection = self.get_or_create_collection(collection_name)
+            where = {"doc_id": doc_ids[0]} if len(doc_ids) == 1 else {"doc_id": {"$in": doc_ids}}
+            result = collection.get(where=cast(Where, where))
+            if not result or not result.get("ids"):
+                return {}
+
+            ids = result.get("ids", [])
+            metadatas = cast(List[Dict[str, Any]], result.get("metadatas", []))
+            documents = cast(List[str], result.get("documents", []))
+
+            # Bulk-append row positions per document, sort once per group at the end
+            rows_by_doc: Dict[str, List[Tuple[float, int]]] = defaultdict(list)
+            for row, metadata in enumerate(metadatas):
+                rows_by_doc[str(metadata.get("doc_id", ""))].append(
+                    (self._order_index_sort_key(metadata), row)
+                )
+
+            user_id = get_operation_user_id()
+            chunks_by_doc: Dict[str, List[Chunk]] = {}
+            for doc_id, rows in rows_by_doc.items():
+                rows.sort()
+                chunks_by_doc[doc_id] = [
+                    self._build_chunk_from_retrieval(
+                        chunk_id=ids[row],
+                        document=documents[row],
+                        metadata=metadatas[row],
+                        user_id=user_id,
+                    )
+                    for _, row in rows
+                ]
+
+            logger.debug(
+                f"Got {len(ids)} chunks for {len(chunks_by_doc)} documents in '{collection_name}'"
+            )
+            return chunks_by_doc
+
+        except Exception as e:
+            logger.error(f"Failed to get chunks for {len(doc_ids)} documents: {e}")
+            return {}
+
     def get_chunk_neighbors(
         self,
         collection_name: str,
@@ -1044,38 +1623,69 @@ class ChromaDBStore:
             List of neighboring Chunk objects (including the target chunk)
         """
         try:
-            current_chunk = self.get_chunk_by_id(collection_name, chunk_id)
-            if not current_chunk:
-                return []
-
-            neighbors: List[Chunk] = []
+            collection = self.get_or_create_collection(collection_name)
 
-            # Get before chunks
-            prev_chunk = current_chunk
-            before_chunks: List[Chunk] = []
-            for _ in range(window_size):
-                prev = self.get_previous_chunk(collection_name, prev_chunk.chunk_id)
-                if prev:
-                    before_chunks.insert(0, prev)  # Insert at beginning for ordering
-                    prev_chunk = prev
-                else:
-                    break
+            # Get the current chunk's doc_id and chunk_order_index
+            position = self._get_chunk_position(collection, collection_name, chunk_id)
+            if position is None:
+                logger.debug(f"Chunk '{chunk_id}' not found in '{collection_name}'")
+                return []
+            doc_id = position[0]
+            if not doc_id:
+                logger.warning(f"Chunk '{chunk_id}' has no doc_id in metadata")
+                return []
+            current_order_index = int(position[1])
 
-            # Get after chunks
-            next_chunk = current_chunk
-            after_chunks: List[Chunk] = []
-            for _ in range(window_size):
-                nxt = self.get_next_chunk(collection_name, next_chunk.chunk_id)
-                if nxt:
-                    after_chunks.append(nxt)
-                    next_chunk = nxt
-                else:
+            # Fetch the whole window in one range read instead of one round-trip per step
+            window = collection.get(
+                where=cast(
+                    Where,
+                    {
+                        "$and": [
+                            {"doc_id": doc_id},
+                            {"chunk_order_index": {"$gte": current_order_index - window_size}},
+                            {"chunk_order_index": {"$lte": current_order_index + window_size}},
+                        ]
+                    },
+                )
+            )
+            window_ids = window.get("ids", []) if window else []
+            window_metadatas = cast(List[Dict[str, Any]], window.get("metadatas") or [])
+            window_documents = cast(List[str], window.get("documents") or [])
+
+            # Order indices in the window are dense, so rows are slotted into a list
+            # at (order_index - window_start) rather than hashed into a dict
+            window_start = current_order_index - window_size
+            slots: List[Optional[int]] = [None] * (2 * window_size + 1)
+            for row, metadata in enumerate(window_metadatas):
+                slot = int(self._order_index_sort_key(metadata)) - window_start
+                if 0 <= slot < len(slots) and slots[slot] is None:
+                    slots[slot] = row
+            # Make sure the target itself is present even if its index collides
+            for row, window_id in enumerate(window_ids):
+                if window_id == chunk_id:
+                    slots[window_size] = row
                     break
 
-            # Combine: before + current + after
-            neighbors.extend(before_chunks)
-            neighbors.append(current_chunk)
-            neighbors.extend(after_chunks)
+            # Walk outwards from the target and stop at the first gap on each side,
+            # matching the previous chunk-by-chunk traversal
+            first = window_size
+            while first > 0 and slots[first - 1] is not None:
+                first -= 1
+            last = window_size
+            while last < len(slots) - 1 and slots[last + 1] is not None:
+                last += 1
+
+            user_id = get_operation_user_id()
+            neighbors: List[Chunk] = [
+                self._build_chunk_from_retrieval(
+                    chunk_id=window_ids[row],
+                    document=window_documents[row],
+                    metadata=window_metadatas[row],
+                    user_id=user_id,
+                )
+                for row in cast(List[int], slots[first : last + 1])
+            ]
 
             logger.debug(
                 f"Got {len(neighbors)} neighbors for chunk '{chunk_id}' with window_size={window_size}"
@@ -1109,9 +1719,10 @@ class ChromaDBStore:
 
     def delete_collection(self, name: str) -> None:
         """Delete a collection."""
-        with self._lock:
+        with self._lock, self._collection_cache_lock:
             self.client.delete_collection(name)
             self._collection_cache.pop(name, None)
+            self._forget_chunk_positions(name)
             logger.info(f"Collection '{name}' deleted")
 
     # ========== S3 Operations (Production) ==========
@@ -1158,22 +1769,35 @@ class ChromaDBStore:
         s3_prefix = f"{collection_name}/{timestamp}/"
         s3_service = get_s3_service()
 
-        for file_path in collection_path.rglob("*"):
-            if file_path.is_file():
-                relative_path = file_path.relative_to(self.persist_dir)
+        # os.walk is scandir-based and already separates files from directories,
+        # so no extra stat call is needed per entry
+        uploads: List[Tuple[str, Future[bool]]] = []
+        for dir_path, _, file_names in os.walk(collection_path):
+            for file_name in file_names:
+                file_path = os.path.join(dir_path, file_name)
+                relative_path = os.path.relpath(file_path, self.persist_dir)
                 s3_key = f"{s3_prefix}{relative_path}"
-
-                try:
-                    success = s3_service.upload_file_from_path(
-                        str(file_path),
+                # Segment files are uploaded concurrently on io_executor workers
+                uploads.append(
+                    (
                         s3_key,
+                        io_executor.submit(
+                            copy_context().run,
+                            s3_service.upload_file_from_path,
+                            file_path,
+                            s3_key,
+                        ),
                     )
-                    if success:
-                        logger.debug(f"Uploaded {s3_key}")
-                    else:
-                        logger.error(f"Failed to upload {s3_key}")
-                except Exception as e:
-                    logger.error(f"Failed to upload {s3_key}: {e}")
+                )
+
+        for s3_key, future in uploads:
+            try:
+                if future.result():
+                    logger.debug(f"Uploaded {s3_key}")
+                else:
+                    logger.error(f"Failed to upload {s3_key}")
+            except Exception as e:
+                logger.error(f"Failed to upload {s3_key}: {e}")
 
     def restore_from_s3(self, collection_name: str, timestamp: Optional[str] = None) -> bool:
         """
@@ -1221,6 +1845,7 @@ class ChromaDBStore:
         s3_service = get_s3_service()
         objects = s3_service.list_objects(prefix=s3_prefix)
 
+        downloads: List[Tuple[str, Future[bool]]] = []
         for obj in objects:
             s3_key = obj["Key"]
             relative_key = s3_key[len(s3_prefix) :]
@@ -1228,12 +1853,22 @@ class ChromaDBStore:
 
             local_path.parent.mkdir(parents=True, exist_ok=True)
 
-            try:
-                success = s3_service.download_file_to_path(
+            # Segment files are downloaded concurrently on io_executor workers
+            downloads.append(
+                (
                     s3_key,
-                    str(local_path),
+                    io_executor.submit(
+                        copy_context().run,
+                        s3_service.download_file_to_path,
+                        s3_key,
+                        str(local_path),
+                    ),
                 )
-                if success:
+            )
+
+        for s3_key, future in downloads:
+            try:
+                if future.result():
                     logger.debug(f"Downloaded {s3_key}")
                 else:
                     logger.error(f"Failed to download {s3_key}")
@@ -1241,8 +1876,9 @@ class ChromaDBStore:
                 logger.error(f"Failed to download {s3_key}: {e}")
 
         # Invalidate cache (inside lock)
-        with self._lock:
+        with self._collection_cache_lock:
             self._collection_cache.pop(collection_name, None)
+        self._forget_chunk_positions(collection_name)
 
     def _get_latest_s3_timestamp(self, collection_name: str) -> Optional[str]:
         """Get the latest backup timestamp for a collection."""
@@ -1345,6 +1981,9 @@ def get_chromadb_store(
                 persist_dir=persist_dir,
                 mode=mode,
                 s3_enabled=s3_enabled,
+                embedding_dimensions=Config.EMBEDDING_DIMENSIONS,
+                memory_limit_bytes=Config.CHROMA_MEMORY_LIMIT_BYTES,
+                hnsw_config=Config.CHROMA_HNSW_CONFIG,
             )
             logger.debug("ChromaDB store singleton instance created")
 
@@ -3,6 +3,8 @@
 
 import os
 import sys
+import shutil
+import tempfile
 import traceback
 import json
 
@@ -135,9 +137,156 @@ def test_json_storage():
     print("=" * 50)
 
 
+def test_json_storage_wal_replay():
+    """Test that WAL records survive a restart and fold into the snapshot on compact"""
+    print("Testing JSON Storage WAL replay...")
+
+    storage_dir = tempfile.mkdtemp(prefix="test_json_storage_wal_")
+    try:
+        storage = JSONStorage(storage_dir, enable_sharding=False)
+        for i in range(3):
+            storage.update_one(
+                "wal_test",
+                {"_id": f"doc{i}"},
+                {"$set": {"index": i}, "$setOnInsert": {"_id": f"doc{i}"}},
+                upsert=True,
+            )
+        storage.update_one("wal_test", {"_id": "doc1"}, {"$inc": {"index": 10}})
+        storage.delete_one("wal_test", {"_id": "doc2"})
+
+        collection_file = storage._get_collection_path("wal_test")  # type: ignore
+        assert not os.path.exists(collection_file)
+        assert os.path.exists(collection_file + ".wal")
+
+        # A fresh instance rebuilds the collection from the WAL alone
+        reopened = JSONStorage(storage_dir, enable_sharding=False)
+        docs = {d["_id"]: d["index"] for d in reopened.find("wal_test", {})}
+        print(f"   Replayed: {docs}")
+        assert docs == {"doc0": 0, "doc1": 11}
+
+        # Returned documents are copies; modifying them does not touch the storage
+        reopened.find_one("wal_test", {"_id": "doc0"})["index"] = 99  # type: ignore
+        assert reopened.find_one("wal_test", {"_id": "doc0"})["index"] == 0  # type: ignore
+
+        reopened.compact("wal_test")
+        assert not os.path.exists(collection_file + ".wal")
+        with open(collection_file, "r") as f:
+            assert json.load(f) == {
+                "doc0": {"_id": "doc0", "index": 0},
+                "doc1": {"_id": "doc1", "index": 11},
+            }
+        print("   ✓ WAL replay and compaction successful")
+    finally:
+        shutil.rmtree(storage_dir, ignore_errors=True)
+
+
+def test_json_storage_insert_many():
+    """Test batched inserts in one write and pymongo-style duplicate handling"""
+    from pymongo.errors import DuplicateKeyError
+
+    print("Testing JSON Storage insert_many...")
+
+    storage_dir = tempfile.mkdtemp(prefix="test_json_storage_bulk_")
+    try:
+        storage = JSONStorage(storage_dir, enable_sharding=False)
+        inserted = storage.insert_many(
+            "bulk_test", [{"_id": f"doc{i}", "index": i} for i in range(100)]
+        )
+        assert inserted == 100
+
+        # One WAL record per stored document, no snapshot rewrites
+        wal_path = storage._get_collection_path("bulk_test") + ".wal"  # type: ignore
+        with open(wal_path, "r") as f:
+            assert len(f.readlines()) == 100
+
+        with JSONStorageSession(storage) as db:
+            result = db["bulk_test"].insert_many([{"index": 200}, {"index": 201}])
+            assert len(result.inserted_ids) == 2
+
+            # Ordered: documents before the duplicate are stored, the rest are not
+            try:
+                db["bulk_test"].insert_many(
+                    [{"_id": "doc100"}, {"_id": "doc0", "index": -1}, {"_id": "doc101"}]
+                )
+                assert False, "Expected DuplicateKeyError"
+            except DuplicateKeyError:
+                pass
+            assert db["bulk_test"].find_one({"_id": "doc100"}) is not None
+            assert db["bulk_test"].find_one({"_id": "doc101"}) is None
+
+            # Unordered: every non-duplicate document is stored before the error
+            try:
+                db["bulk_test"].insert_many(
+                    [{"_id": "doc0", "index": -1}, {"_id": "doc101"}, {"_id": "doc101"}],
+                    ordered=False,
+                )
+                assert False, "Expected DuplicateKeyError"
+            except DuplicateKeyError:
+                pass
+        assert len(storage.find("bulk_test", {})) == 104
+        assert storage.find_one("bulk_test", {"_id": "doc0"}) == {"_id": "doc0", "index": 0}
+        print("   ✓ insert_many successful")
+    finally:
+        shutil.rmtree(storage_dir, ignore_errors=True)
+
+
+def test_json_storage_add_to_set_each():
+    """Test $addToSet with $each adds only values not already present"""
+    print("Testing JSON Storage $addToSet $each...")
+
+    storage_dir = tempfile.mkdtemp(prefix="test_json_storage_set_")
+    try:
+        storage = JSONStorage(storage_dir, enable_sharding=False)
+        storage.update_one(
+            "set_test", {"_id": "kb1"}, {"$addToSet": {"doc_ids": "doc1"}}, upsert=True
+        )
+        result = storage.update_one(
+            "set_test",
+            {"_id": "kb1"},
+            {"$addToSet": {"doc_ids": {"$each": ["doc2", "doc1", "doc3", "doc2"]}}},
+        )
+        assert result["modified_count"] == 1
+        doc = storage.find_one("set_test", {"_id": "kb1"})
+        assert doc is not None and doc["doc_ids"] == ["doc1", "doc2", "doc3"]
+
+        result = storage.update_one(
+            "set_test", {"_id": "kb1"}, {"$addToSet": {"doc_ids": {"$each": ["doc3"]}}}
+        )
+        assert result["modified_count"] == 0
+        print("   ✓ $addToSet $each successful")
+    finally:
+        shutil.rmtree(storage_dir, ignore_errors=True)
+
+
+def test_json_storage_external_change():
+    """Test cached collections are reloaded when another instance changes the file"""
+    print("Testing JSON Storage cache invalidation...")
+
+    storage_dir = tempfile.mkdtemp(prefix="test_json_storage_cache_")
+    try:
+        reader = JSONStorage(storage_dir, enable_sharding=False)
+        writer = JSONStorage(storage_dir, enable_sharding=False)
+        writer.insert_many("cache_test", [{"_id": "doc1", "version": 1}])
+        assert reader.find_one("cache_test", {"_id": "doc1"}) == {"_id": "doc1", "version": 1}
+
+        writer.update_one("cache_test", {"_id": "doc1"}, {"$set": {"version": 2}})
+        assert reader.find_one("cache_test", {"_id": "doc1"}) == {"_id": "doc1", "version": 2}
+
+        writer.compact("cache_test")
+        writer.insert_many("cache_test", [{"_id": "doc2", "version": 1}])
+        assert len(reader.find("cache_test", {})) == 2
+        print("   ✓ Cache invalidation successful")
+    finally:
+        shutil.rmtree(storage_dir, ignore_errors=True)
+
+
 if __name__ == "__main__":
     try:
         test_json_storage()
+        test_json_storage_wal_replay()
+        test_json_storage_insert_many()
+        test_json_storage_add_to_set_each()
+        test_json_storage_external_change()
     except Exception as e:
         print(f"\n✗ Test failed: {e}")
 